@@ -2,6 +2,7 @@
 Class definitions for data structures used by the search algorithms
 """
 import heapq  # for the priority queue implementation
+import collections  # deque for the queue implementation
 
 
 class Node(object):
@@ -87,7 +88,7 @@ class Queue:
     """
 
     def __init__(self):
-        self.list = []
+        self.list = collections.deque()  # O(1) at both ends
 
     def push(self, item):
         """
@@ -95,14 +96,14 @@ class Queue:
         :param item: (of any type)
         :return: None
         """
-        self.list.insert(0, item)
+        self.list.append(item)
 
     def pop(self):
         """
         Remove the earliest pushed item from the queue and return it.
         :return: item (of any type)
         """
-        return self.list.pop()
+        return self.list.popleft()
 
     def is_empty(self):
         """
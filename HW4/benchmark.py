@@ -0,0 +1,290 @@
+# ----------------------------------------------------------------------
+# Name:     benchmark
+# Purpose:  Time the search algorithms on a set of quests
+#
+# Author: Byron O'Gorman
+# ----------------------------------------------------------------------
+"""
+Benchmark the search algorithms without the graphical display
+
+Usage:  benchmark.py [-a search_algorithm] [-H heuristic] [-r repeat]
+                     [maze_file ...]
+        benchmark.py --large SIZE [--mazes N] [--medals K]
+                     [--cluster-size C] [-H heuristic]
+        benchmark.py --workers 1,2,4,8 [-H heuristic] [maze_file ...]
+        benchmark.py --replan EDITS [-H heuristic] [maze_file ...]
+The maze files default to questA.txt through questI.txt.
+
+Each quest is solved once with the binary heap fringe and once with the
+bucket queue fringe and the best time out of the repeats is reported.
+
+With --large, random SIZE x SIZE mazes are generated and solved with
+astar and with hpa_star (hierarchical A*).
+
+With --workers, each quest is solved with parallel_astar using each
+number of worker processes listed, to measure how it scales.
+
+With --replan, walls are added at random open cells of each quest, one
+at a time, and the IncrementalPlanner repair is compared to a new astar
+search after each edit.
+
+Example:  benchmark.py -a astar -H gen_heuristic questB.txt questF.txt
+          benchmark.py --large 200 --mazes 3
+"""
+import io
+import time
+import random
+import argparse
+import data_structures
+import uninformed_search
+import informed_search
+from spartanquest import Problem, HierarchicalProblem
+
+QUESTS = ['quest' + letter + '.txt' for letter in 'ABCDEFGHI']
+
+
+def solve(maze_file, search, heuristic):
+    """
+    Read the quest in the given file and solve it
+    :param
+    maze_file (string): name of the text file containing the maze info
+    search (string): name of the search algorithm
+    heuristic (string): name of the heuristic, used with astar only
+    :return: (tuple) the quest, its solution and the processing time
+    """
+    quest = Problem(open(maze_file))
+    start_time = time.perf_counter()
+    if search == 'astar':
+        solution = informed_search.astar(quest,
+                                         getattr(informed_search, heuristic))
+    else:
+        solution = getattr(uninformed_search, search)(quest)
+    return quest, solution, time.perf_counter() - start_time
+
+
+def compare_fringes(maze_files, search, heuristic, repeat):
+    """
+    Print the time taken with each kind of fringe on every quest
+    :param
+    maze_files (list of strings): the quests to solve
+    search (string): name of the search algorithm
+    heuristic (string): name of the heuristic, used with astar only
+    repeat (int): how many times to solve each quest with each fringe
+    :return: None
+    """
+    print(f'{"quest":<12}{"cost":>8}{"expanded":>12}'
+          f'{"heap(sec)":>12}{"buckets(sec)":>14}{"speedup":>9}')
+    for maze_file in maze_files:
+        times = {}
+        for use_buckets in (False, True):
+            data_structures.use_buckets = use_buckets
+            best = None
+            for _ in range(repeat):
+                quest, solution, elapsed = solve(maze_file, search, heuristic)
+                best = elapsed if best is None else min(best, elapsed)
+            times[use_buckets] = best
+        data_structures.use_buckets = True
+        cost = '-' if solution is None else quest.path_cost(solution)
+        print(f'{maze_file:<12}{cost:>8}{quest.nodes_expanded():>12,}'
+              f'{times[False]:>12.4f}{times[True]:>14.4f}'
+              f'{times[False] / times[True]:>8.2f}x')
+
+
+def generate_maze(size, medals, wall_density, seed):
+    """
+    Generate a random square maze
+    :param
+    size (int): the width and height of the maze
+    medals (int): the number of medals
+    wall_density (float): the probability that a cell is a wall
+    seed (int): the seed of the random number generator
+    :return: (io.StringIO) a file object containing the maze info
+    """
+    generator = random.Random(seed)
+    rows = [['W' if generator.random() < wall_density else '-'
+             for x in range(size)] for y in range(size)]
+    cells = generator.sample(range(size * size), medals + 1)
+    for cell, char in zip(cells, 'S' + 'M' * medals):
+        rows[cell // size][cell % size] = char
+    return io.StringIO(''.join(''.join(row) + '\n' for row in rows))
+
+
+def compare_hierarchical(size, mazes, medals, cluster_size, heuristic):
+    """
+    Print the time taken by astar and hpa_star on generated mazes
+    :param
+    size (int): the width and height of the mazes
+    mazes (int): the number of mazes to generate
+    medals (int): the number of medals in each maze
+    cluster_size (int): hpa_star cluster width and height
+    heuristic (string): name of the heuristic
+    :return: None
+    """
+    heuristic_function = getattr(informed_search, heuristic)
+    print(f'{"seed":<6}{"astar cost":>11}{"expanded":>11}{"(sec)":>9}'
+          f'{"hpa cost":>10}{"expanded":>10}{"build(sec)":>11}'
+          f'{"search(sec)":>12}')
+    for seed in range(mazes):
+        quest = Problem(generate_maze(size, medals, 0.25, seed))
+        start_time = time.perf_counter()
+        solution = informed_search.astar(quest, heuristic_function)
+        astar_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        abstract = HierarchicalProblem(
+            generate_maze(size, medals, 0.25, seed), cluster_size)
+        build_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        abstract_solution = informed_search.astar(abstract,
+                                                  heuristic_function)
+        if abstract_solution is not None:
+            abstract_solution = abstract.unpack(abstract_solution)
+        search_time = time.perf_counter() - start_time
+        if solution is None:
+            print(f'{seed:<6}{"no solution":>11}')
+            continue
+        print(f'{seed:<6}{quest.path_cost(solution):>11}'
+              f'{quest.nodes_expanded():>11,}{astar_time:>9.3f}'
+              f'{quest.path_cost(abstract_solution):>10}'
+              f'{abstract.nodes_expanded():>10,}{build_time:>11.3f}'
+              f'{search_time:>12.3f}')
+
+
+def compare_workers(maze_files, heuristic, worker_counts):
+    """
+    Print the time taken by parallel_astar with different numbers of
+    worker processes and the nodes expanded by each worker
+    :param
+    maze_files (list of strings): the quests to solve
+    heuristic (string): name of the heuristic
+    worker_counts (list of ints): the numbers of workers to try
+    :return: None
+    """
+    heuristic_function = getattr(informed_search, heuristic)
+    print(f'{"quest":<12}{"workers":>8}{"cost":>7}{"(sec)":>9}{"speedup":>9}'
+          f'  nodes expanded per worker')
+    for maze_file in maze_files:
+        baseline = None
+        for workers in worker_counts:
+            quest = Problem(open(maze_file))
+            expanded = []
+            start_time = time.perf_counter()
+            solution = informed_search.parallel_astar(
+                quest, heuristic_function, workers, report=expanded.extend)
+            elapsed = time.perf_counter() - start_time
+            baseline = baseline or elapsed
+            cost = '-' if solution is None else quest.path_cost(solution)
+            print(f'{maze_file:<12}{workers:>8}{cost:>7}{elapsed:>9.3f}'
+                  f'{baseline / elapsed:>8.2f}x  '
+                  + ' '.join(f'{count:,}' for count in expanded))
+
+
+def compare_replanning(maze_files, edits, heuristic):
+    """
+    Print the time taken by the IncrementalPlanner to replan after each
+    wall added and by a new astar search on the edited maze
+    :param
+    maze_files (list of strings): the quests to solve
+    edits (int): the number of walls to add to each quest
+    heuristic (string): name of the heuristic used by astar
+    :return: None
+    """
+    heuristic_function = getattr(informed_search, heuristic)
+    print(f'{"quest":<12}{"wall":>10}{"cost":>7}{"replan(sec)":>13}'
+          f'{"astar(sec)":>12}')
+    for maze_file in maze_files:
+        quest = Problem(open(maze_file))
+        start_time = time.perf_counter()
+        planner = informed_search.IncrementalPlanner(quest)
+        solution = planner.plan()
+        elapsed = time.perf_counter() - start_time
+        cost = '-' if solution is None else quest.path_cost(solution)
+        print(f'{maze_file:<12}{"none":>10}{cost:>7}{elapsed:>13.4f}')
+        generator = random.Random(0)
+        open_cells = [position for position in quest.maze.positions
+                      if not quest.maze.is_wall(position)
+                      and position != quest.mascot_position
+                      and position not in quest.medals]
+        for position in generator.sample(open_cells,
+                                         min(edits, len(open_cells))):
+            start_time = time.perf_counter()
+            planner.add_wall(position)
+            solution = planner.plan()
+            elapsed = time.perf_counter() - start_time
+            cost = '-' if solution is None else quest.path_cost(solution)
+            # a new search on the quest, the planner updated its maze
+            start_time = time.perf_counter()
+            informed_search.astar(quest, heuristic_function)
+            astar_time = time.perf_counter() - start_time
+            print(f'{"":<12}{str(position):>10}{cost:>7}{elapsed:>13.4f}'
+                  f'{astar_time:>12.4f}')
+
+
+def get_arguments():
+    """
+    Parse the command line arguments
+    :return: (argparse.Namespace) the arguments specified
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('maze_files',
+                        help='names of the text files containing the mazes',
+                        nargs='*',
+                        default=QUESTS)
+    parser.add_argument('-a', '--search-algorithm',
+                        help='astar or ucs?',
+                        choices=['astar', 'ucs'],
+                        default='astar')
+    parser.add_argument('-H', '--heuristic',
+                        help='A* heuristic',
+                        default='gen_heuristic')
+    parser.add_argument('-r', '--repeat',
+                        help='number of runs per quest and fringe',
+                        type=int,
+                        default=3)
+    parser.add_argument('--large',
+                        help='compare astar and hpa_star on generated '
+                             'mazes of this width and height',
+                        type=int)
+    parser.add_argument('--mazes',
+                        help='number of mazes to generate',
+                        type=int,
+                        default=3)
+    parser.add_argument('--medals',
+                        help='number of medals in each generated maze',
+                        type=int,
+                        default=1)
+    parser.add_argument('--cluster-size',
+                        help='hpa_star cluster width and height',
+                        type=int,
+                        default=10)
+    parser.add_argument('--workers',
+                        help='compare parallel_astar with these numbers '
+                             'of worker processes, e.g. 1,2,4,8')
+    parser.add_argument('--replan',
+                        help='compare replanning with astar after this '
+                             'many walls added',
+                        type=int)
+    return parser.parse_args()
+
+
+def main():
+    arguments = get_arguments()
+    if arguments.large:
+        compare_hierarchical(arguments.large, arguments.mazes,
+                             arguments.medals, arguments.cluster_size,
+                             arguments.heuristic)
+        return
+    if arguments.workers:
+        compare_workers(arguments.maze_files, arguments.heuristic,
+                        [int(count) for count in
+                         arguments.workers.split(',')])
+        return
+    if arguments.replan:
+        compare_replanning(arguments.maze_files, arguments.replan,
+                           arguments.heuristic)
+        return
+    compare_fringes(arguments.maze_files, arguments.search_algorithm,
+                    arguments.heuristic, arguments.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,16 @@
 """
 Class definitions for data structures used by the search algorithms
 """
+import os
 import heapq  # for the priority queue implementation
+import numbers  # the bucket queue checks for int priorities
+import collections  # deques for the queue and the bucket queue
+from array import array  # compact storage for the node arena
+import numpy as np  # record arrays for the disk-backed structures
+
+# Let frontier pick a BucketQueue when all priorities are integers.
+# Set to False to always use the binary heap (e.g. for benchmarking).
+use_buckets = True
 
 
 class Node(object):
@@ -50,6 +59,70 @@ class Node(object):
         return path
 
 
+class NodeArena(object):
+    """
+    Array-backed store for the nodes of a search tree/graph.
+    A node is an int id: the index of its entry in parallel arrays
+    holding its state, parent id, action code and cumulative cost.
+    This replaces one Node object per generated child by a few array
+    slots.
+    Arguments:
+    step_costs: (dictionary) maps each action of the problem to its
+        cost.  Cumulative costs are stored as 64 bit ints when all the
+        step costs are ints, as floats otherwise.
+    Attributes:
+    states: (list) the state of each node
+    parents: (array of ints) the parent id of each node, -1 for a root
+    action_codes: (array of ints) the index in actions of the action
+        that got us to each node, -1 for a root
+    costs: (array of numbers) the cumulative cost from the root to
+        each node
+    actions: (list) the actions, indexed by action code
+    """
+
+    def __init__(self, step_costs):
+        self.actions = list(step_costs)
+        self.codes = {action: code
+                      for code, action in enumerate(self.actions)}
+        integer_costs = all(type(cost) is int for cost in step_costs.values())
+        self.states = []
+        self.parents = array('l')
+        self.action_codes = array('i')
+        self.costs = array('q' if integer_costs else 'd')
+
+    def add(self, state, parent, action, cumulative_cost=0):
+        """
+        Add a node to the arena and return its id
+        :param
+        state: problem state corresponding to this node
+        parent: (int) the id of the parent node or -1 if root node
+        action: the action that got us to the state or None if root
+        cumulative_cost: the cumulative total cost from the root
+        :return: (int) the id of the new node
+        """
+        self.states.append(state)
+        self.parents.append(parent)
+        self.action_codes.append(-1 if action is None else self.codes[action])
+        self.costs.append(cumulative_cost)
+        return len(self.states) - 1
+
+    def solution(self, node):
+        """
+        Returns the sequence of actions from the root to the given node
+        :param node: (int) the id of a node
+        :return: list of actions
+        """
+        path = []
+        while self.parents[node] >= 0:
+            path.append(self.actions[self.action_codes[node]])
+            node = self.parents[node]
+        path.reverse()
+        return path
+
+    def __len__(self):
+        return len(self.states)
+
+
 class Stack(object):
     """
     Represent a stack with LIFO (last in first out) queuing
@@ -87,7 +160,7 @@ class Queue:
     """
 
     def __init__(self):
-        self.list = []
+        self.list = collections.deque()  # O(1) at both ends
 
     def push(self, item):
         """
@@ -95,14 +168,14 @@ class Queue:
         :param item: (of any type)
         :return: None
         """
-        self.list.insert(0, item)
+        self.list.append(item)
 
     def pop(self):
         """
         Remove the earliest pushed item from the queue and return it.
         :return: item (of any type)
         """
-        return self.list.pop()
+        return self.list.popleft()
 
     def is_empty(self):
         """
@@ -148,3 +221,679 @@ class PriorityQueue(object):
         :return: (Boolean) True if the queue is empty, False otherwise
         """
         return not self.heap
+
+
+class IndexedPriorityQueue(object):
+    """
+    Represent a priority queue where each item is identified by a
+    unique key (typically a problem state).  The queue holds at most
+    one entry per key and the priority of an entry can be lowered in
+    place with decrease_key.
+    Implemented as a binary heap with a dictionary mapping each key
+    to its position in the heap.
+    Items with equal priorities are popped in the order they were
+    pushed.
+    """
+
+    def __init__(self):
+        # entries are lists [priority, count, key, item]
+        # counts are unique so comparing entries never reaches the key
+        self.heap = []
+        self.index = {}  # key -> position of its entry in the heap
+        self.count = 0
+
+    def push(self, key, item, priority):
+        """
+        Add the given item with the given key and priority to the queue
+        :param
+        key: (any hashable type) must not already be in the queue
+        item: (of any type)
+        priority: (number or other orderable type)
+        :return: None
+        """
+        entry = [priority, self.count, key, item]
+        self.count += 1
+        self.heap.append(entry)
+        self.index[key] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def pop(self):
+        """
+        Remove the item with the lowest priority from the queue and return it.
+        :return: item (of any type)
+        """
+        last = self.heap.pop()
+        if self.heap:
+            priority, count, key, item = self.heap[0]
+            self.heap[0] = last
+            self.index[last[2]] = 0
+            self._sift_down(0)
+        else:
+            priority, count, key, item = last
+        del self.index[key]
+        return item
+
+    def decrease_key(self, key, item, priority):
+        """
+        Replace the item associated with the given key and lower its
+        priority.
+        :param
+        key: (any hashable type) a key currently in the queue
+        item: (of any type) the new item for that key
+        priority: (number or other orderable type) must not be higher
+            than the current priority of the key
+        :return: None
+        """
+        position = self.index[key]
+        entry = self.heap[position]
+        entry[0] = priority
+        entry[3] = item
+        self._sift_up(position)
+
+    def update(self, key, item, priority):
+        """
+        Replace the item associated with the given key and change its
+        priority, up or down.
+        :param
+        key: (any hashable type) a key currently in the queue
+        item: (of any type) the new item for that key
+        priority: (number or other orderable type) the new priority
+        :return: None
+        """
+        position = self.index[key]
+        entry = self.heap[position]
+        entry[0] = priority
+        entry[3] = item
+        self._sift_up(position)
+        self._sift_down(self.index[key])
+
+    def remove(self, key):
+        """
+        Remove the entry with the given key from the queue
+        :param key: (any hashable type) a key currently in the queue
+        :return: None
+        """
+        position = self.index.pop(key)
+        last = self.heap.pop()
+        if position < len(self.heap):
+            self.heap[position] = last
+            self.index[last[2]] = position
+            self._sift_up(position)
+            self._sift_down(self.index[last[2]])
+
+    def contains(self, key):
+        """
+        Is there an entry with the given key in the queue?
+        :param key: (any hashable type)
+        :return: (Boolean) True if the key is in the queue, False otherwise
+        """
+        return key in self.index
+
+    def priority_of(self, key):
+        """
+        Return the current priority of the given key
+        :param key: (any hashable type) a key currently in the queue
+        :return: (number or other orderable type) its priority
+        """
+        return self.heap[self.index[key]][0]
+
+    def is_empty(self):
+        """
+        Is this priority queue empty?
+        :return: (Boolean) True if the queue is empty, False otherwise
+        """
+        return not self.heap
+
+    def min_priority(self):
+        """
+        Return the lowest priority in the queue without removing its item
+        :return: (number or other orderable type) the lowest priority
+        """
+        return self.heap[0][0]
+
+    def keys(self):
+        """
+        Return the keys currently in the queue
+        :return: list of keys, in no particular order
+        """
+        return list(self.index)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def _sift_up(self, position):
+        """
+        Move the entry at the given position up until its parent has a
+        lower priority.
+        This is a private method.
+        :param position: (int) index in the heap
+        :return: None
+        """
+        heap = self.heap
+        entry = heap[position]
+        while position > 0:
+            parent = (position - 1) >> 1
+            if heap[parent] < entry:
+                break
+            heap[position] = heap[parent]
+            self.index[heap[position][2]] = position
+            position = parent
+        heap[position] = entry
+        self.index[entry[2]] = position
+
+    def _sift_down(self, position):
+        """
+        Move the entry at the given position down until both its
+        children have a higher priority.
+        This is a private method.
+        :param position: (int) index in the heap
+        :return: None
+        """
+        heap = self.heap
+        size = len(heap)
+        entry = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if entry < heap[child]:
+                break
+            heap[position] = heap[child]
+            self.index[heap[position][2]] = position
+            position = child
+        heap[position] = entry
+        self.index[entry[2]] = position
+
+
+class BucketQueue(object):
+    """
+    Represent a monotone bucket queue (Dial's algorithm) keyed like an
+    IndexedPriorityQueue.  Priorities must be non-negative ints.
+    Each priority value has its own FIFO bucket and pop scans upward
+    from the lowest non-empty bucket, so push and pop are O(1)
+    amortized when the priorities popped never decrease by much,
+    which holds for ucs and for astar with a consistent heuristic.
+    decrease_key moves the key to a lower bucket, the entry left in
+    the old bucket is stale and is skipped when it is reached.
+    The first time a priority is not an int (a heuristic returning a
+    float for some states), the entries are moved to an
+    IndexedPriorityQueue which then holds the queue, so the search
+    goes on with a binary heap.  pop and min_priority raise IndexError
+    when the queue is empty.
+    """
+
+    def __init__(self):
+        self.buckets = {}  # priority -> deque of keys
+        self.entries = {}  # key -> [priority, item]
+        self.current = 0  # no live entry has a lower priority
+        self.heap = None  # the IndexedPriorityQueue after a fallback
+
+    def push(self, key, item, priority):
+        """
+        Add the given item with the given key and priority to the queue
+        :param
+        key: (any hashable type) must not already be in the queue
+        item: (of any type)
+        priority: (number)
+        :return: None
+        """
+        if self.heap is None and not self._is_int(priority):
+            self._fall_back()
+        if self.heap is not None:
+            self.heap.push(key, item, priority)
+            return
+        bucket = self._bucket(priority)
+        self.entries[key] = [priority, item]
+        bucket.append(key)
+
+    def pop(self):
+        """
+        Remove the item with the lowest priority from the queue and return it.
+        :return: item (of any type)
+        :raise IndexError: if the queue is empty
+        """
+        if self.heap is not None:
+            return self.heap.pop()
+        if not self.entries:
+            raise IndexError('pop from an empty priority queue')
+        while True:
+            bucket = self.buckets.get(self.current)
+            while bucket:
+                key = bucket.popleft()
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] == self.current:
+                    del self.entries[key]
+                    return entry[1]
+            # this bucket is exhausted, move on to the next one
+            self.buckets.pop(self.current, None)
+            self.current += 1
+
+    def decrease_key(self, key, item, priority):
+        """
+        Replace the item associated with the given key and lower its
+        priority.
+        :param
+        key: (any hashable type) a key currently in the queue
+        item: (of any type) the new item for that key
+        priority: (number) must not be higher than the current priority
+        :return: None
+        """
+        if self.heap is None and not self._is_int(priority):
+            self._fall_back()
+        if self.heap is not None:
+            self.heap.decrease_key(key, item, priority)
+            return
+        bucket = self._bucket(priority)
+        entry = self.entries[key]
+        entry[0] = priority
+        entry[1] = item
+        bucket.append(key)
+
+    def contains(self, key):
+        """
+        Is there an entry with the given key in the queue?
+        :param key: (any hashable type)
+        :return: (Boolean) True if the key is in the queue, False otherwise
+        """
+        if self.heap is not None:
+            return self.heap.contains(key)
+        return key in self.entries
+
+    def priority_of(self, key):
+        """
+        Return the current priority of the given key
+        :param key: (any hashable type) a key currently in the queue
+        :return: (number) its priority
+        """
+        if self.heap is not None:
+            return self.heap.priority_of(key)
+        return self.entries[key][0]
+
+    def is_empty(self):
+        """
+        Is this priority queue empty?
+        :return: (Boolean) True if the queue is empty, False otherwise
+        """
+        if self.heap is not None:
+            return self.heap.is_empty()
+        return not self.entries
+
+    def min_priority(self):
+        """
+        Return the lowest priority in the queue without removing its item
+        :return: (number) the lowest priority
+        :raise IndexError: if the queue is empty
+        """
+        if self.heap is not None:
+            return self.heap.min_priority()
+        if not self.entries:
+            raise IndexError('min_priority of an empty priority queue')
+        while True:
+            bucket = self.buckets.get(self.current)
+            while bucket:
+                entry = self.entries.get(bucket[0])
+                if entry is not None and entry[0] == self.current:
+                    return self.current
+                bucket.popleft()  # drop the stale entry
+            self.buckets.pop(self.current, None)
+            self.current += 1
+
+    def keys(self):
+        """
+        Return the keys currently in the queue
+        :return: list of keys, in no particular order
+        """
+        if self.heap is not None:
+            return self.heap.keys()
+        return list(self.entries)
+
+    def __len__(self):
+        if self.heap is not None:
+            return len(self.heap)
+        return len(self.entries)
+
+    @staticmethod
+    def _is_int(priority):
+        return type(priority) is int or isinstance(priority, numbers.Integral)
+
+    def _fall_back(self):
+        """
+        Move the entries to an IndexedPriorityQueue, in the order they
+        would be popped, which holds the queue from now on.
+        This is a private method.
+        :return: None
+        """
+        self.heap = IndexedPriorityQueue()
+        for priority in sorted(self.buckets):
+            for key in self.buckets[priority]:
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] == priority and \
+                        not self.heap.contains(key):
+                    self.heap.push(key, entry[1], priority)
+        self.buckets = {}
+        self.entries = {}
+
+    def _bucket(self, priority):
+        """
+        Return the bucket for the given priority, creating it if needed.
+        This is a private method.
+        :param priority: (int)
+        :return: deque of keys
+        """
+        if priority < self.current:
+            # only happens with an inconsistent heuristic
+            self.current = priority
+        bucket = self.buckets.get(priority)
+        if bucket is None:
+            bucket = self.buckets[priority] = collections.deque()
+        return bucket
+
+
+class DominanceIndex(object):
+    """
+    Index the medal bitmasks settled at each position, for dominance
+    pruning in multi-medal searches.
+    A state (position, medals) reached at some cost is dominated by a
+    state at the same position with a subset of its remaining medals
+    reached at an equal or lower cost: every way to finish the quest
+    from the first state also finishes it from the second one.
+    Subset queries are answered with bitsets over the states settled
+    at a position: one int per medal, where bit j is set when the j-th
+    state settled there does not have that medal left.
+
+    Arguments:
+    medal_count (int): the number of medals in the quest
+
+    Attributes:
+    medal_count (int): the number of medals in the quest
+    settled (dictionary): maps each position to a tuple (costs,
+        lacking).  costs[j] is the cost of the j-th state settled at
+        that position and bit j of lacking[i] is set when that state
+        does not have medal i left.
+    """
+
+    def __init__(self, medal_count):
+        self.medal_count = medal_count
+        self.settled = {}
+
+    def add(self, position, medals, cost):
+        """
+        Record a settled state
+        :param
+        position: tuple (x, y) representing a maze position
+        medals: (int) bitmask of the remaining medals
+        cost: (number) the cost of the path to that state
+        :return: None
+        """
+        entry = self.settled.get(position)
+        if entry is None:
+            entry = self.settled[position] = ([], [0] * self.medal_count)
+        costs, lacking = entry
+        bit = 1 << len(costs)
+        costs.append(cost)
+        for i in range(self.medal_count):
+            if not medals >> i & 1:
+                lacking[i] |= bit
+
+    def dominated(self, position, medals, cost):
+        """
+        Is the given state dominated by a settled state?
+        :param
+        position: tuple (x, y) representing a maze position
+        medals: (int) bitmask of the remaining medals
+        cost: (number) the cost of the path to that state
+        :return: (Boolean) True if a state at that position with a
+        subset of these medals was settled at an equal or lower cost
+        """
+        entry = self.settled.get(position)
+        if entry is None:
+            return False
+        costs, lacking = entry
+        # the settled states lacking every medal this state lacks
+        candidates = (1 << len(costs)) - 1
+        for i in range(self.medal_count):
+            if not medals >> i & 1:
+                candidates &= lacking[i]
+                if not candidates:
+                    return False
+        while candidates:
+            lowest = candidates & -candidates
+            if costs[lowest.bit_length() - 1] <= cost:
+                return True
+            candidates ^= lowest
+        return False
+
+
+class DiskBuckets(object):
+    """
+    Frontier of an external memory search: one bucket of records per
+    integer priority.  A record is a row (state, parent state) of a
+    NumPy int64 array.  Records are buffered in memory and spilled to
+    .npy files in the given directory when the buffers hold more than
+    capacity records.
+
+    Arguments:
+    directory (string): where the spilled buckets are written
+    capacity (int): the maximum number of records buffered in memory
+
+    Attributes:
+    directory (string): where the spilled buckets are written
+    capacity (int): the maximum number of records buffered in memory
+    buffers (dictionary): maps each priority to a list of arrays of
+        records kept in memory
+    files (dictionary): maps each priority to a list of .npy files
+        holding spilled records
+    buffered (int): the number of records kept in memory
+    """
+
+    def __init__(self, directory, capacity):
+        self.directory = directory
+        self.capacity = capacity
+        self.buffers = collections.defaultdict(list)
+        self.files = collections.defaultdict(list)
+        self.buffered = 0
+        self._spills = 0
+
+    def push(self, priority, records):
+        """
+        Add records to the bucket with the given priority
+        :param
+        priority: (int) the priority of the records
+        records: (NumPy array) rows (state, parent state)
+        :return: None
+        """
+        if len(records):
+            self.buffers[priority].append(records)
+            self.buffered += len(records)
+            if self.buffered > self.capacity:
+                self.spill()
+
+    def spill(self):
+        """
+        Write every buffered bucket to its own file
+        :return: None
+        """
+        for priority, arrays in self.buffers.items():
+            self._spills += 1
+            name = os.path.join(self.directory, f'bucket{self._spills}.npy')
+            np.save(name, np.concatenate(arrays))
+            self.files[priority].append(name)
+        self.buffers.clear()
+        self.buffered = 0
+
+    def is_empty(self):
+        return not self.buffers and not self.files
+
+    def min_priority(self):
+        """
+        Return the lowest priority of a non empty bucket
+        :return: (int) the priority
+        """
+        return min(self.buffers.keys() | self.files.keys())
+
+    def pop(self, priority):
+        """
+        Remove the bucket with the given priority
+        :param priority: (int) the priority of the bucket
+        :return: generator of arrays of records, holding at most
+        capacity records each.  Spilled files are deleted once read.
+        """
+        names = self.files.pop(priority, [])
+        arrays = self.buffers.pop(priority, [])
+        self.buffered -= sum(len(records) for records in arrays)
+        for name in names:
+            records = np.load(name)
+            os.remove(name)
+            yield records
+        if arrays:
+            yield np.concatenate(arrays)
+
+
+class DiskClosedSet(object):
+    """
+    Closed set of an external memory search, holding the parent state
+    of every settled state for path reconstruction.
+    Settled records (state, parent state) are kept in memory until they
+    are more than capacity, then written to the given directory as a
+    run file sorted by state, that is memory-mapped to answer queries.
+    Run files of similar sizes are merged, like the runs in memory, so
+    that there are only a logarithmic number of them to search.
+
+    Arguments:
+    directory (string): where the run files are written
+    capacity (int): the maximum number of records kept in memory
+
+    Attributes:
+    directory (string): where the run files are written
+    capacity (int): the maximum number of records kept in memory
+    runs (list of NumPy arrays): the memory-mapped runs, and the
+        records kept in memory, sorted by state
+    resident (int): the number of records kept in memory
+    """
+
+    def __init__(self, directory, capacity):
+        self.directory = directory
+        self.capacity = capacity
+        self.runs = []
+        self.resident = 0
+        self._recent = 0  # how many runs at the end are in memory
+        self._flushes = 0
+        self._names = []  # the file of each run on disk
+
+    def remove_known(self, records):
+        """
+        Delayed duplicate detection: drop the records whose state is
+        already settled
+        :param records: (NumPy array) rows (state, parent state)
+        :return: (NumPy array) the records with a new state
+        """
+        new = np.ones(len(records), np.bool_)
+        for run in self.runs:
+            found = np.searchsorted(run[:, 0], records[:, 0])
+            found[found == len(run)] = 0
+            new &= run[found, 0] != records[:, 0]
+        return records[new]
+
+    def add(self, records):
+        """
+        Settle the states of the given records
+        :param records: (NumPy array) rows (state, parent state)
+        sorted by state
+        :return: None
+        """
+        self.runs.append(records)
+        self._recent += 1
+        self.resident += len(records)
+        # merge the runs in memory of similar sizes so they stay few
+        while self._recent > 1 and \
+                len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            merged = np.concatenate(self.runs[-2:])
+            self.runs[-2:] = [merged[np.argsort(merged[:, 0])]]
+            self._recent -= 1
+        if self.resident > self.capacity:
+            self.flush()
+
+    def flush(self):
+        """
+        Merge the records kept in memory into a memory-mapped run file
+        :return: None
+        """
+        recent = np.concatenate(self.runs[-self._recent:])
+        recent = recent[np.argsort(recent[:, 0])]
+        name = self._run_name()
+        np.save(name, recent)
+        self.runs[-self._recent:] = [np.load(name, mmap_mode='r')]
+        self._names.append(name)
+        self._recent = 0
+        self.resident = 0
+        while len(self.runs) > 1 and \
+                len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            self._merge_files()
+
+    def _run_name(self):
+        """
+        Return the name of a new run file
+        This is a private method.
+        :return: (string) the file name
+        """
+        self._flushes += 1
+        return os.path.join(self.directory, f'run{self._flushes}.npy')
+
+    def _merge_files(self):
+        """
+        Merge the last two run files into one.  Both are sorted by state
+        and hold different states, so each record goes to its index in
+        its run plus the number of records of the other run with a
+        lower state.  The records are placed capacity at a time so that
+        the runs are never loaded whole.
+        This is a private method.
+        :return: None
+        """
+        first, second = self.runs[-2:]
+        name = self._run_name()
+        merged = np.lib.format.open_memmap(
+            name, 'w+', first.dtype, (len(first) + len(second), 2))
+        step = max(1, self.capacity)
+        for run, other in ((first, second), (second, first)):
+            for start in range(0, len(run), step):
+                chunk = np.asarray(run[start:start + step])
+                merged[start + np.arange(len(chunk)) +
+                       np.searchsorted(other[:, 0], chunk[:, 0])] = chunk
+        merged.flush()
+        del merged, first, second, run, other
+        self.runs[-2:] = [np.load(name, mmap_mode='r')]
+        for old_name in self._names[-2:]:
+            os.remove(old_name)
+        self._names[-2:] = [name]
+
+    def parent(self, state):
+        """
+        Return the parent state of a settled state
+        :param state: (int) a settled state
+        :return: (int) its parent state, -1 for the root
+        """
+        for run in self.runs:
+            found = np.searchsorted(run[:, 0], state)
+            if found < len(run) and run[found, 0] == state:
+                return int(run[found, 1])
+        raise KeyError(state)
+
+
+def frontier(step_costs, priority):
+    """
+    Return an empty keyed priority queue for ucs and astar.
+    A BucketQueue is returned when all the step costs and the given
+    sample priority (the priority of the root node) are ints, an
+    IndexedPriorityQueue otherwise.  A BucketQueue that later gets a
+    priority that is not an int moves to a binary heap by itself.
+    :param
+    step_costs: (iterable of numbers) the costs of the actions
+    priority: (number) the priority of the first item to be pushed
+    :return: BucketQueue or IndexedPriorityQueue object
+    """
+    if use_buckets and all(type(value) is int
+                           for value in [*step_costs, priority]):
+        return BucketQueue()
+    return IndexedPriorityQueue()
@@ -12,11 +12,27 @@ Your task for homework 4 is to implement:
 2.  single_heuristic
 3.  better_heuristic
 4.  gen_heuristic
+
+ida_star is a low memory alternative to astar.
+ara_star is an anytime version of astar.
+parallel_astar distributes astar over worker processes.
+frontier_astar is an astar that keeps no closed set.
+mst_heuristic uses the true maze costs to the medals.
+alt_heuristic uses landmark distance tables.
+CachedHeuristic memoizes any heuristic.
+IncrementalPlanner repairs its solution when the walls or Sammy move.
 """
+import math
+import time
+import heapq
+import queue
+import pickle
+import collections
+import multiprocessing
 import data_structures
 
 
-def astar(problem, heuristic):
+def astar(problem, heuristic, dominance=False):
     """
     A* graph search algorithm
     returns a solution for the given search problem
@@ -24,28 +40,1106 @@ def astar(problem, heuristic):
     problem (a Problem object) representing the quest
             see Problem class definition in spartanquest.py
     heuristic (a function) the heuristic function to be used
+    dominance (Boolean): prune the states dominated by a settled state
+            at the same position with a subset of their medals (see
+            data_structures.DominanceIndex) instead of keeping a
+            closed set
     :return: list of actions representing the solution to the quest
                 or None if there is no solution
     """
-    # Enter your code here and remove the pass statement below
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
     closed = set()  # keep track of our explored states
-    fringe = data_structures.PriorityQueue()  # for ucd, the fringe is a priority queue
+    settled = data_structures.DominanceIndex(  # used with dominance
+        len(problem.medal_list))
+    nodes = data_structures.NodeArena(problem.cost)  # node ids are ints
     state = problem.start_state()
-    root = data_structures.Node(state, None, None)
-    fringe.push(root, root.cumulative_cost)
+    root = nodes.add(state, -1, None)
+    priority = heuristic(state, problem)
+    if priority == math.inf:
+        return None  # a medal cannot be reached
+    # the fringe holds a single entry per state
+    # (a bucket queue when step costs and heuristic values are ints)
+    fringe = data_structures.frontier(problem.cost.values(), priority)
+    fringe.push(state, root, priority)
     while not fringe.is_empty():
         node = fringe.pop()
-        if problem.is_goal(node.state):
-            return node.solution()  # we found a solution
-        if node.state not in closed:  # we are implementing graph search
-            closed.add(node.state)
-            for child_state, action, action_cost in problem.expand(node.state):  # add action cost to cumulative cost
-                child_node = data_structures.Node(child_state, node, action, node.cumulative_cost + action_cost)
-                fringe.push(child_node,
-                            child_node.cumulative_cost + heuristic(child_state, problem))  # add new node to PQ
+        state = nodes.states[node]
+        if problem.is_goal(state):
+            return nodes.solution(node)  # we found a solution
+        if dominance:
+            position, medals = state
+            if settled.dominated(position, medals, nodes.costs[node]):
+                continue  # a state settled since it was pushed is better
+            settled.add(position, medals, nodes.costs[node])
+        else:
+            closed.add(state)  # we are implementing graph search
+        for child_state, action, action_cost in problem.expand(state):
+            if child_state in closed:
+                continue
+            cost = nodes.costs[node] + action_cost
+            if dominance and settled.dominated(*child_state, cost):
+                continue
+            priority = cost + heuristic(child_state, problem)
+            if priority == math.inf:
+                continue  # a medal cannot be reached from this state
+            if not fringe.contains(child_state):
+                child_node = nodes.add(child_state, node, action, cost)
+                fringe.push(child_state, child_node, priority)
+            elif priority < fringe.priority_of(child_state):
+                # cheaper path to a state already in the fringe
+                child_node = nodes.add(child_state, node, action, cost)
+                fringe.decrease_key(child_state, child_node, priority)
+    return None  # Failure -  no solution was found
+
+
+def ida_star(problem, heuristic, table_size=10000):
+    """
+    Iterative deepening A* search algorithm
+    returns a solution for the given search problem
+    Runs successive depth first searches that prune nodes whose
+    f = g + h exceeds a bound.  The first bound is the heuristic value
+    of the start state and each following bound is the smallest f that
+    exceeded the previous one.  Only the current path is kept, so the
+    memory used is linear in the solution depth.
+    :param
+    problem (a Problem object) representing the quest
+            see Problem class definition in spartanquest.py
+    heuristic (a function) the heuristic function to be used.
+            It must be admissible for the solution to be optimal.
+    table_size (int) the maximum number of states kept in a
+            transposition table recording the cheapest cost at which
+            each state was reached in the current iteration, 0 for
+            no table
+    :return: list of actions representing the solution to the quest
+                or None if there is no solution
+    """
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
+    state = problem.start_state()
+    if problem.is_goal(state):
+        return []
+    bound = heuristic(state, problem)
+    while bound != math.inf:
+        solution, bound = _bounded_search(problem, heuristic, bound,
+                                          table_size)
+        if solution is not None:
+            return solution
+    return None  # Failure -  no solution was found
+
+
+def _bounded_search(problem, heuristic, bound, table_size):
+    """
+    One depth first iteration of ida_star.
+    This is a private function.
+    :param
+    problem (a Problem object) representing the quest
+    heuristic (a function) the heuristic function to be used
+    bound (number) nodes with a higher f are pruned
+    table_size (int) the size of the transposition table, 0 for none
+    :return: (tuple) the solution or None, and the smallest f that
+             exceeded the bound (math.inf if none did)
+    """
+    next_bound = math.inf
+    state = problem.start_state()
+    actions = []  # the actions along the current path
+    on_path = {state}  # the states along the current path
+    table = collections.OrderedDict()  # state -> cheapest cost seen
+    # each frame is (state, cost from the start, remaining children)
+    stack = [(state, 0, iter(problem.expand(state)))]
+    while stack:
+        state, cost, children = stack[-1]
+        for child_state, action, action_cost in children:
+            if child_state in on_path:
+                continue  # a cycle cannot lead to a cheaper solution
+            child_cost = cost + action_cost
+            f = child_cost + heuristic(child_state, problem)
+            if f > bound:
+                next_bound = min(next_bound, f)
+                continue
+            if table_size:
+                if table.get(child_state, math.inf) <= child_cost:
+                    continue  # already searched at a lower cost
+                table[child_state] = child_cost
+                table.move_to_end(child_state)
+                if len(table) > table_size:
+                    table.popitem(last=False)
+            if problem.is_goal(child_state):
+                return actions + [action], bound  # we found a solution
+            actions.append(action)
+            on_path.add(child_state)
+            stack.append((child_state, child_cost,
+                          iter(problem.expand(child_state))))
+            break
+        else:  # all the children have been searched, backtrack
+            stack.pop()
+            on_path.discard(state)
+            if stack:
+                actions.pop()
+    return None, next_bound
+
+
+def ara_star(problem, heuristic, weight=3.0, weight_step=0.5,
+             time_limit=None, node_limit=None, report=None):
+    """
+    Anytime repairing A* (ARA*) search algorithm
+    Runs weighted A* (priority g + weight * h) to find a first solution
+    quickly, then lowers the weight and improves the solution.  Each
+    pass reuses the costs and the fringe of the previous one: only
+    states whose cost improved since they were expanded are searched
+    again.  Stops when a pass with weight 1 completes (the solution is
+    then optimal) or when the time or node budget is exhausted.
+    :param
+    problem (a Problem object) representing the quest
+            see Problem class definition in spartanquest.py
+    heuristic (a function) the heuristic function to be used.
+            It must be consistent for the bounds reported to hold.
+    weight (number) the initial heuristic weight, at least 1
+    weight_step (number) how much the weight is lowered after each pass
+    time_limit (number) wall-clock budget in seconds, None for no limit
+    node_limit (int) maximum number of nodes expanded, None for no limit
+    report (a function) called as report(solution, cost, bound) each
+            time a pass ends with a cheaper solution or a tighter bound.
+            bound is an upper bound on the ratio of cost to the optimal
+            cost.
+    :return: list of actions representing the best solution found
+                or None if no solution was found
+    """
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
+    deadline = None
+    if time_limit is not None:
+        deadline = time.perf_counter() + time_limit
+    expanded = 0
+    state = problem.start_state()
+    if problem.is_goal(state):
+        return []
+    cost = {state: 0}  # cheapest cost found so far for each state
+    parent = {state: None}  # state -> (parent state, action)
+    h = {state: heuristic(state, problem)}
+    closed = set()  # states expanded in the current pass
+    inconsistent = set()  # closed states whose cost improved
+    fringe = data_structures.IndexedPriorityQueue()
+    fringe.push(state, state, weight * h[state])
+    goal = None  # best goal state found so far
+    best = None  # the solution to the best goal state
+    reported = (math.inf, math.inf)  # the last cost and bound reported
+    while True:
+        # improve the solution with the current weight
+        out_of_budget = False
+        while not fringe.is_empty() and (
+                goal is None or fringe.min_priority() < cost[goal]):
+            if (deadline is not None and time.perf_counter() > deadline) \
+                    or (node_limit is not None and expanded >= node_limit):
+                out_of_budget = True
+                break
+            state = fringe.pop()
+            expanded += 1
+            for child_state, action, action_cost in problem.expand(state):
+                child_cost = cost[state] + action_cost
+                if child_cost >= cost.get(child_state, math.inf):
+                    continue
+                cost[child_state] = child_cost
+                parent[child_state] = (state, action)
+                if problem.is_goal(child_state):
+                    if goal is None or child_cost < cost[goal]:
+                        goal = child_state
+                    continue  # nothing to gain by expanding a goal
+                if child_state not in h:
+                    h[child_state] = heuristic(child_state, problem)
+                if h[child_state] == math.inf:
+                    continue  # a medal cannot be reached from this state
+                if child_state in closed:
+                    inconsistent.add(child_state)
+                    continue
+                priority = child_cost + weight * h[child_state]
+                if fringe.contains(child_state):
+                    fringe.decrease_key(child_state, child_state, priority)
+                else:
+                    fringe.push(child_state, child_state, priority)
+        if goal is None:
+            # out of budget, or the whole quest was searched in vain
+            return None
+        # the optimal cost is at least the lowest g + h still pending
+        pending = fringe.keys() + list(inconsistent)
+        lower = min((cost[s] + h[s] for s in pending), default=math.inf)
+        bound = max(1.0, cost[goal] / lower)
+        if not out_of_budget:
+            bound = min(weight, bound)
+        if (cost[goal], bound) < reported:  # better solution or bound
+            best = _path(parent, goal)
+            reported = (cost[goal], bound)
+            if report is not None:
+                report(best, problem.path_cost(best), bound)
+        if out_of_budget or weight <= 1.0 or bound <= 1.0:
+            return best
+        # lower the weight and search again from the pending states
+        weight = max(1.0, weight - weight_step)
+        fringe = data_structures.IndexedPriorityQueue()
+        for s in pending:
+            fringe.push(s, s, cost[s] + weight * h[s])
+        inconsistent = set()
+        closed = set()
+
+
+def _path(parent, state):
+    """
+    Follow the parent links back from the given state
+    This is a private function.
+    :param
+    parent (dictionary) maps each state to (parent state, action)
+    state: the last state of the path
+    :return: list of actions from the start state to the given state
+    """
+    actions = []
+    while parent[state] is not None:
+        state, action = parent[state]
+        actions.append(action)
+    actions.reverse()
+    return actions
+
+
+def frontier_astar(problem, heuristic):
+    """
+    Frontier A* graph search algorithm: A* without a closed set
+    Expanded states are dropped from memory.  Instead, each state of
+    the fringe records which of its moves lead back to states already
+    generated (see _frontier_search), so they are never regenerated.
+    The path is rebuilt by divide and conquer: a first search finds the
+    cost of the solution, a second one records where the path crosses
+    half of that cost, then both halves are solved the same way.
+    Run with null_heuristic, this is a frontier uniform cost search.
+    :param
+    problem (a Problem object) representing the quest
+            see Problem class definition in spartanquest.py
+    heuristic (a function) the heuristic function to be used
+    :return: list of actions representing the solution to the quest
+                or None if there is no solution
+    :raise ValueError: if the problem has other actions than the single
+    step moves, such as the CorridorProblem macro-actions
+    """
+    if set(problem.cost) != set(problem.moves):
+        raise ValueError('frontier_astar only searches single step moves')
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
+    start = problem.start_state()
+    found = _frontier_search(problem, start, None, heuristic, None)
+    if found is None:
+        return None  # Failure -  no solution was found
+    return _frontier_path(problem, start, None, found[0], heuristic)
+
+
+def _frontier_path(problem, start, target, cost, heuristic):
+    """
+    Divide and conquer path reconstruction for frontier_astar
+    This is a private function.
+    :param
+    problem (a Problem object) representing the quest
+    start: the state to start from
+    target: the state to reach, or None to reach a goal state
+    cost (number): the cost of the cheapest path from start to target
+    heuristic (a function) the heuristic function used toward a goal
+        state.  The search toward a given target state uses none.
+    :return: list of actions from start to target
+    """
+    if cost == 0:
+        return []
+    if target is not None:
+        heuristic = null_heuristic  # it estimates the cost to a goal
+    crossing = _frontier_search(problem, start, target, heuristic,
+                                cost / 2)[1]
+    # the move that crosses half the cost splits the path in two
+    before, before_cost, action, after, after_cost = crossing
+    return (_frontier_path(problem, start, before, before_cost, heuristic)
+            + [action]
+            + _frontier_path(problem, after, target, cost - after_cost,
+                             heuristic))
+
+
+def _frontier_search(problem, start, target, heuristic, threshold):
+    """
+    A* search that only keeps the fringe in memory
+    Each fringe state keeps a bitmask of its used moves: the moves
+    leading to states already generated.  When a state is expanded the
+    move back from each child is marked as used in that child.
+    Collecting a medal cannot be undone, so a state where a medal was
+    just collected cannot move back to its predecessors holding that
+    medal.  Instead, those predecessors get their move toward it marked
+    as used.  The marks for predecessors not generated yet are kept
+    aside until they are generated.
+    This is a private function.
+    :param
+    problem (a Problem object) representing the quest
+    start: the state to start from
+    target: the state to reach, or None to reach a goal state
+    heuristic (a function) the heuristic function to be used
+    threshold (number): record the move where the path crosses this
+        cost, or None
+    :return: (tuple) the cost of the cheapest path and the crossing
+    move: (state before, its cost, action, state after, its cost), or
+    None if there is no path
+    """
+    maze = problem.maze
+    codes = {action: 1 << i for i, action in enumerate(problem.moves)}
+    back = {action: codes[other]
+            for action, (dx, dy) in problem.moves.items()
+            for other, offset in problem.moves.items()
+            if offset == (-dx, -dy)}
+    priority = heuristic(start, problem)
+    if priority == math.inf:
+        return None  # a medal cannot be reached
+    # frontier[state] = [cost, used moves bitmask, crossing move]
+    frontier = {start: [0, 0, None]}
+    blocked = {}  # state not generated yet -> used moves bitmask
+    fringe = data_structures.frontier(problem.cost.values(), priority)
+    fringe.push(start, start, priority)
+    while not fringe.is_empty():
+        state = fringe.pop()
+        cost, used, crossing = frontier.pop(state)
+        if state == target or target is None and problem.is_goal(state):
+            return cost, crossing  # we found a solution
+        position, medals = state
+        bit = problem.medal_bits.get(position, 0)
+        if state != start and bit and not medals & bit:
+            # the medal here was just collected: block the moves here
+            # from the states that still hold it
+            for source, action, action_cost in \
+                    maze.predecessors[maze.index(position)]:
+                other = maze.positions[source]
+                if not medals & problem.medal_bits.get(other, 0):
+                    other_state = (other, medals | bit)
+                    if other_state in frontier:
+                        frontier[other_state][1] |= codes[action]
+                    else:
+                        blocked[other_state] = \
+                            blocked.get(other_state, 0) | codes[action]
+        for child_state, action, action_cost in problem.expand(state):
+            if used & codes[action]:
+                continue  # already generated
+            child_cost = cost + action_cost
+            priority = child_cost + heuristic(child_state, problem)
+            if priority == math.inf:
+                continue  # a medal cannot be reached from this state
+            entry = frontier.get(child_state)
+            if entry is None:
+                entry = frontier[child_state] = \
+                    [math.inf, blocked.pop(child_state, 0), None]
+            if child_state[1] == medals:  # the child can move back here
+                entry[1] |= back[action]
+            if child_cost < entry[0]:
+                entry[0] = child_cost
+                entry[2] = crossing
+                if crossing is None and threshold is not None and \
+                        child_cost >= threshold:
+                    entry[2] = (state, cost, action, child_state,
+                                child_cost)
+                if fringe.contains(child_state):
+                    fringe.decrease_key(child_state, child_state, priority)
+                else:
+                    fringe.push(child_state, child_state, priority)
     return None  # Failure -  no solution was found
 
 
+def parallel_astar(problem, heuristic, workers=2, batch_size=64,
+                   report=None):
+    """
+    Hash distributed A* (HDA*) search algorithm
+    Each state is owned by the worker process given by its hash modulo
+    the number of workers.  Every worker keeps its own fringe and the
+    cheapest cost found for its states, expands its best nodes and
+    sends the children it does not own to their owners in batches.  A
+    node is reopened when a cheaper path to it arrives later.
+    A worker that raises an exception or dies stops the search: the
+    other workers are terminated and the exception is raised here.
+    Goals found are reported to this (coordinating) process, which
+    broadcasts the cost of the best one so the workers ignore nodes
+    that cannot improve on it.  The search ends when two successive
+    probes find every worker idle and the same, balanced, number of
+    nodes sent and received, so no node is in transit and the best
+    goal is optimal.  The path is then traced back through the parent
+    links held by the workers.
+    :param
+    problem (a Problem object) representing the quest
+            see Problem class definition in spartanquest.py
+    heuristic (a function) the heuristic function to be used.
+            It must be admissible for the solution to be optimal.
+    workers (int) the number of worker processes
+    batch_size (int) the number of nodes a worker expands between
+            exchanges with the other processes
+    report (a function) called as report(expanded) at the end, with
+            the list of the number of nodes expanded by each worker
+    :return: list of actions representing the solution to the quest
+                or None if there is no solution
+    """
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
+    state = problem.start_state()
+    if problem.is_goal(state):
+        return []
+    inboxes = [multiprocessing.Queue() for _ in range(workers)]
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(
+                     target=_hda_worker,
+                     args=(index, problem, heuristic, inboxes, results,
+                           batch_size),
+                     daemon=True)
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+
+    def receive():
+        # the next message from the workers, a worker error is raised
+        while True:
+            try:
+                message = results.get(timeout=1)
+            except queue.Empty:
+                if any(process.exitcode not in (None, 0)
+                       for process in processes):
+                    message = ('error', RuntimeError(
+                        'a parallel_astar worker process died'))
+                else:
+                    continue
+            if message[0] == 'error':
+                for process in processes:
+                    process.terminate()
+                raise message[1]
+            return message
+
+    inboxes[hash(state) % workers].put(('nodes', [(state, 0, None, None)]))
+    best_cost, goal = math.inf, None
+    previous = None  # the totals of the previous probe
+    wave = 0
+    while True:
+        # probe every worker and wait for all the replies
+        wave += 1
+        for inbox in inboxes:
+            inbox.put(('probe', wave))
+        replies = []
+        while len(replies) < workers:
+            message = receive()
+            if message[0] == 'goal' and message[1] < best_cost:
+                best_cost, goal = message[1], message[2]
+                for inbox in inboxes:
+                    inbox.put(('bound', best_cost))
+            elif message[0] == 'probe' and message[1] == wave:
+                replies.append(message[2:])
+        idle = all(reply[0] for reply in replies)
+        totals = (sum(reply[1] for reply in replies) + 1,  # the root
+                  sum(reply[2] for reply in replies), best_cost)
+        if idle and totals[0] == totals[1] and totals == previous:
+            break  # terminated: nothing left to expand or in transit
+        previous = totals if idle else None
+    solution = None
+    if goal is not None:  # follow the parent links back to the start
+        solution = []
+        state = goal
+        while True:
+            inboxes[hash(state) % workers].put(('trace', state))
+            message = receive()
+            while message[0] != 'trace':
+                message = receive()
+            state, action = message[1]
+            if action is None:
+                break
+            solution.append(action)
+        solution.reverse()
+    for inbox in inboxes:
+        inbox.put(('stop',))
+    expanded = [0] * workers
+    for _ in range(workers):
+        message = receive()
+        while message[0] != 'stats':
+            message = receive()
+        expanded[message[1]] = message[2]
+    for process in processes:
+        process.join()
+    problem.count_expanded(sum(expanded))
+    if report is not None:
+        report(expanded)
+    return solution
+
+
+def _hda_worker(index, problem, heuristic, inboxes, results, batch_size):
+    """
+    Run a parallel_astar worker process.  An exception raised by the
+    search is sent to the coordinator, which raises it again.
+    This is a private function.
+    :param: see _hda_search
+    :return: None
+    """
+    try:
+        _hda_search(index, problem, heuristic, inboxes, results,
+                    batch_size)
+    except Exception as error:
+        try:
+            pickle.dumps(error)
+        except Exception:
+            error = RuntimeError(repr(error))  # cannot be sent as is
+        results.put(('error', error))
+
+
+def _hda_search(index, problem, heuristic, inboxes, results, batch_size):
+    """
+    The search loop of a parallel_astar worker process.
+    This is a private function.
+    :param
+    index (int) the number of this worker
+    problem (a Problem object) representing the quest
+    heuristic (a function) the heuristic function to be used
+    inboxes (list of multiprocessing.Queue) the inbox of every worker
+    results (multiprocessing.Queue) messages to the coordinator
+    batch_size (int) nodes expanded between exchanges
+    :return: None
+    """
+    workers = len(inboxes)
+    inbox = inboxes[index]
+    cost = {}  # cheapest cost found for each state owned
+    parent = {}  # state -> (parent state, action)
+    fringe = data_structures.IndexedPriorityQueue()
+    outgoing = [[] for _ in range(workers)]
+    bound = math.inf  # cost of the best goal known
+    sent = received = expanded = 0
+
+    def add(state, state_cost, parent_state, action):
+        # a node for a state owned by this worker
+        if state_cost >= cost.get(state, math.inf):
+            return
+        priority = state_cost + heuristic(state, problem)
+        if priority >= bound:
+            return  # cannot lead to a better goal
+        cost[state] = state_cost
+        parent[state] = (parent_state, action)
+        if fringe.contains(state):
+            fringe.decrease_key(state, state, priority)
+        else:
+            fringe.push(state, state, priority)
+
+    while True:
+        idle = fringe.is_empty() or fringe.min_priority() >= bound
+        messages = []
+        try:
+            # wait for messages only when there is nothing to expand
+            messages.append(inbox.get(timeout=0.01) if idle
+                            else inbox.get_nowait())
+            while True:
+                messages.append(inbox.get_nowait())
+        except queue.Empty:
+            pass
+        for message in messages:
+            kind = message[0]
+            if kind == 'nodes':
+                received += len(message[1])
+                for node in message[1]:
+                    add(*node)
+            elif kind == 'bound':
+                bound = min(bound, message[1])
+            elif kind == 'probe':
+                idle = fringe.is_empty() or fringe.min_priority() >= bound
+                results.put(('probe', message[1], idle, sent, received))
+            elif kind == 'trace':
+                results.put(('trace', parent[message[1]]))
+            elif kind == 'stop':
+                results.put(('stats', index, expanded))
+                return
+        for _ in range(batch_size):
+            if fringe.is_empty() or fringe.min_priority() >= bound:
+                break
+            state = fringe.pop()
+            expanded += 1
+            if problem.is_goal(state):
+                bound = cost[state]
+                results.put(('goal', cost[state], state))
+                continue
+            for child_state, action, action_cost in problem.expand(state):
+                child = (child_state, cost[state] + action_cost, state,
+                         action)
+                owner = hash(child_state) % workers
+                if owner == index:
+                    add(*child)
+                else:
+                    outgoing[owner].append(child)
+        for owner, batch in enumerate(outgoing):
+            if batch:
+                inboxes[owner].put(('nodes', batch))
+                sent += len(batch)
+                outgoing[owner] = []
+
+
+class CachedHeuristic(object):
+    """
+    Wrap a heuristic function and cache its value for each state, so
+    that states generated again from other parents are not evaluated
+    twice.  The least recently used values are evicted once the cache
+    is full.  A CachedHeuristic is called like the heuristic it wraps.
+    The cache is keyed by state only: use one CachedHeuristic per
+    problem.
+
+    Arguments:
+    heuristic (a function): the heuristic function to be cached
+    max_size (int): the maximum number of values kept in the cache
+
+    Attributes:
+    heuristic (a function): the heuristic function being cached
+    max_size (int): the maximum number of values kept in the cache
+    hits (int): number of calls answered from the cache
+    misses (int): number of calls that evaluated the heuristic
+    """
+
+    def __init__(self, heuristic, max_size=100000):
+        self.heuristic = heuristic
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.cache = collections.OrderedDict()  # least recent first
+
+    def __call__(self, state, problem):
+        value = self.cache.get(state)
+        if value is not None:
+            self.hits += 1
+            self.cache.move_to_end(state)
+            return value
+        self.misses += 1
+        value = self.heuristic(state, problem)
+        self.cache[state] = value
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)  # evict the least recent
+        return value
+
+
+class IncrementalPlanner(object):
+    """
+    Incremental replanning with D* Lite.
+    The planner searches backward from the goal states to Sammy's
+    state, over the (position, medals) states.  Any path to a goal
+    ends with the last medal being collected, so only the states at a
+    medal with no medal left are seeded as goals, and the search never
+    goes back through the other states with no medal left.  The
+    priorities use a lower bound of the cost from Sammy's state that
+    accounts for the medals he has to collect on the way (see
+    _lower_bound).  When a wall is added or removed, or Sammy moves,
+    only the states whose cost to the goal changed are searched again,
+    so replanning after a small edit costs much less than a new search.
+    The bounds are built from tables of the costs to and from each
+    medal, which are computed once.  A new wall leaves them lower
+    bounds, and a removed wall only lowers the entries it gives a
+    shorter path, so only those are relaxed (see _relax).  When Sammy
+    moves or the bounds of every state drop, the D* Lite key modifier
+    km grows by the largest drop instead of the queued states being
+    given new priorities.
+    Walls may open up parts of the maze that were unreachable, so the
+    planner restores the full maze tables with Maze.build_neighbors.
+
+    Arguments:
+    problem (a Problem object) representing the quest
+
+    Attributes:
+    problem (a Problem object) representing the quest
+    start: Sammy's current state
+    g (dictionary): the cost to a goal of each consistent state
+    rhs (dictionary): the one step lookahead cost to a goal
+    fringe (data_structures.IndexedPriorityQueue): the inconsistent
+        states, keyed by state
+    masks (dictionary): maps each position to the medal bitmasks of the
+        states met at that position
+    km (number): the D* Lite key modifier
+    to_medal, from_medal (dictionaries): map each medal position to the
+        list of lower bounds of the cost from each cell to that medal,
+        and from that medal to each cell
+    landmarks (list of tuples): (cost from Sammy, costs to the medal,
+        cost to Sammy, costs from the medal) for each medal
+    detours (list of tuples): (bit, cost from Sammy, costs from the
+        medal, cell index) for each medal Sammy holds
+    bounds (dictionary): the lower bound of each state met since the
+        last change of Sammy's state or of the distance tables
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+        problem.maze.build_neighbors(problem.moves, problem.cost)
+        self.start = problem.start_state()
+        self.g = {}
+        self.rhs = {}
+        self.fringe = data_structures.IndexedPriorityQueue()
+        self.masks = collections.defaultdict(set)
+        self.km = 0
+        maze = problem.maze
+        self.to_medal = {medal: maze.distances_to(maze.index(medal))
+                         for medal in problem.medal_list}
+        self.from_medal = {medal: maze.distances_from(maze.index(medal))
+                           for medal in problem.medal_list}
+        self._set_start()
+        for position in problem.medal_list:
+            self._update_state((position, 0))
+
+    def plan(self):
+        """
+        Repair the search and return the cheapest path from Sammy's
+        state to a goal state
+        :return: list of actions representing the solution to the quest
+                or None if there is no solution
+        """
+        if self.problem.is_goal(self.start):
+            return []
+        self._compute_shortest_path()
+        if self._cost(self.start) == math.inf:
+            return None  # Failure -  no solution was found
+        solution = []
+        state = self.start
+        while not self.problem.is_goal(state):
+            child_state, action, action_cost = min(
+                self._successors(state),
+                key=lambda move: move[2] + self._cost(move[0]))
+            solution.append(action)
+            state = child_state
+        return solution
+
+    def add_wall(self, position):
+        """
+        Add a wall and update the plan
+        :param position: tuple (x, y) representing a maze position
+        :return: None
+        """
+        if position == self.start[0] or position in self.problem.medals:
+            raise ValueError(f'no wall can be added at {position}')
+        self.problem.maze.add_wall(position)
+        self._walls_changed(position, removed=False)
+
+    def remove_wall(self, position):
+        """
+        Remove a wall and update the plan
+        :param position: tuple (x, y) representing a maze position
+        :return: None
+        """
+        self.problem.maze.remove_wall(position)
+        self._walls_changed(position, removed=True)
+
+    def move_mascot(self, position, medals=None):
+        """
+        Move Sammy to a new position
+        :param
+        position: tuple (x, y) representing a maze position
+        medals (int): bitmask of the medals left.  Defaults to the
+            medals left before the move, less the medal at position.
+        :return: None
+        """
+        if medals is None:
+            medals = self.start[1] & ~self._bit(position)
+        self.problem.add_mascot(position)
+        old_position, old_medals = self.start
+        old_landmarks = self.landmarks
+        self.start = (position, medals)
+        self._set_start()
+        if medals != old_medals:
+            # the medals the bounds account for changed
+            self._rekey(self.fringe.keys())
+            return
+        # every lower bound drops by at most the drop of its terms that
+        # depend on Sammy's position
+        drop = x_cost(old_position, position, self.problem) + \
+            y_cost(old_position, position, self.problem)
+        for old, new in zip(old_landmarks, self.landmarks):
+            if old[0] > new[0]:  # the cost from Sammy to the medal
+                drop = max(drop, old[0] - new[0])
+            if new[2] > old[2]:  # the cost from the medal to Sammy
+                drop = max(drop, new[2] - old[2])
+        self._raise_km(drop)
+
+    def _walls_changed(self, position, removed):
+        """
+        Update the maze tables, the distance tables and the states next
+        to the changed cell
+        This is a private method.
+        :param
+        position: tuple (x, y) of the cell whose wall changed
+        removed: (Boolean) True if the wall was removed, False if added
+        :return: None
+        """
+        problem = self.problem
+        problem.maze.update_neighbors(position, problem.moves, problem.cost)
+        problem.walls_changed()
+        if removed:
+            self._bounds_lowered(position)
+        # else the distance tables are still lower bounds: a new wall
+        # only makes paths longer
+        x, y = position
+        cells = [cell for cell in [(x + dx, y + dy) for dx, dy
+                                   in [(0, 0), *problem.moves.values()]]
+                 if problem.maze.within_bounds(cell)]
+        # the moves between these cells changed, for any medals left
+        # that a state met next to the changed cell can have
+        masks = {0}
+        for cell in cells:
+            masks.update(self.masks[cell])
+            masks.update(medals | self._bit(cell)
+                         for medals in self.masks[cell])
+        for cell in cells:
+            for medals in masks:
+                if medals == 0 and not self._bit(cell):
+                    continue  # not a goal state, never searched
+                if not medals & self._bit(cell) or \
+                        (cell, medals) == self.start:
+                    self._update_state((cell, medals))
+
+    def _bounds_lowered(self, position):
+        """
+        Relax the distance tables after the wall at the given cell was
+        removed, and keep the queued priorities lower bounds: km grows
+        by the largest drop of the terms shared by every state, a cost
+        from Sammy to a medal plus a cost between two medals, and the
+        states at a cell whose costs from a medal dropped are given
+        their new priorities.
+        This is a private method.
+        :param position: tuple (x, y) of the cell whose wall was removed
+        :return: None
+        """
+        maze = self.problem.maze
+        cell = maze.index(position)
+        start = maze.index(self.start[0])
+        medal_cells = [maze.index(medal) for medal in self.problem.medal_list]
+        start_drop = between_drop = 0
+        lowered = set()
+        for medal in self.problem.medal_list:
+            old = self._relax(self.to_medal[medal], cell, maze.predecessors,
+                              maze.neighbors)
+            if start in old:
+                start_drop = max(start_drop,
+                                 old[start] - self.to_medal[medal][start])
+            old = self._relax(self.from_medal[medal], cell, maze.neighbors,
+                              maze.predecessors)
+            for other in medal_cells:
+                if other in old:
+                    between_drop = max(
+                        between_drop,
+                        old[other] - self.from_medal[medal][other])
+            lowered.update(old)
+        self._set_start()
+        self._raise_km(start_drop + between_drop)
+        self._rekey(state for other in lowered
+                    for state in [(maze.positions[other], medals)
+                                  for medals in self.masks.get(
+                                      maze.positions[other], ())]
+                    if self.fringe.contains(state))
+
+    @staticmethod
+    def _relax(distances, cell, edges, reverse_edges):
+        """
+        Lower the entries of a distance table that the moves of a
+        newly opened cell give a shorter path, with Dijkstra's algorithm
+        started from that cell.  Only the entries that drop are visited.
+        This is a private method.
+        :param
+        distances: (list of numbers) the table, indexed by cell, updated
+            in place
+        cell: (int) the index of the opened cell
+        edges: (MoveTable) the moves the table is relaxed along,
+            neighbors for a table of costs from a cell
+        reverse_edges: (MoveTable) the moves into each cell along edges
+        :return: (dictionary) the old value of each entry that dropped
+        """
+        old = {}
+        best = min([distances[other] + edge_cost
+                    for other, action, edge_cost in reverse_edges[cell]],
+                   default=math.inf)
+        if best < distances[cell]:
+            old[cell] = distances[cell]
+            distances[cell] = best
+        fringe = [(distances[cell], cell)]
+        while fringe:
+            distance, current = heapq.heappop(fringe)
+            if distance > distances[current]:
+                continue  # stale entry
+            for other, action, edge_cost in edges[current]:
+                if distance + edge_cost < distances[other]:
+                    old.setdefault(other, distances[other])
+                    distances[other] = distance + edge_cost
+                    heapq.heappush(fringe, (distances[other], other))
+        return old
+
+    def _bit(self, position):
+        return self.problem.medal_bits.get(position, 0)
+
+    def _cost(self, state):
+        return self.g.get(state, math.inf)
+
+    def _set_start(self):
+        """
+        Look up the terms of the lower bounds that depend on Sammy's
+        state in the distance tables, and drop the cached bounds
+        This is a private method.
+        :return: None
+        """
+        self.bounds = {}
+        maze = self.problem.maze
+        position, medals = self.start
+        start = maze.index(position)
+        self.landmarks = [(self.to_medal[medal][start], self.to_medal[medal],
+                           self.from_medal[medal][start],
+                           self.from_medal[medal])
+                          for medal in self.problem.medal_list]
+        self.detours = [(bit, self.to_medal[medal][start],
+                         self.from_medal[medal], maze.index(medal))
+                        for medal, bit in self.problem.medal_bits.items()
+                        if medals & bit]
+
+    def _raise_km(self, drop):
+        """
+        Add to km the largest drop of the lower bounds, so that the
+        queued priorities stay lower bounds.  If the drop is unbounded
+        the queued states are given their new priorities instead.
+        This is a private method.
+        :param drop: (number) the largest drop
+        :return: None
+        """
+        if drop == math.inf:
+            self._rekey(self.fringe.keys())
+        else:
+            self.km += drop
+
+    def _rekey(self, states):
+        """
+        Give the given queued states their current priorities
+        This is a private method.
+        :param states: iterable of queued states
+        :return: None
+        """
+        for state in list(states):
+            self.fringe.update(state, state, self._key(state))
+
+    def _lower_bound(self, state):
+        """
+        Lower bound of the cost from Sammy's state to the given state
+        Sammy has to collect the medals he holds that the state does
+        not on the way.  The bound is the largest of a bound of the cost
+        of the cheapest path to the state's position, of the cost of
+        the cheapest path through one of those medals and through two
+        of them in the best order.  The first bound is the larger of
+        the cost of the moves along each axis and of the ALT bounds
+        with the medals as landmarks.  It is a maximum of consistent
+        bounds, so it is consistent.  The bounds are cached until Sammy
+        moves or the distance tables change.
+        This is a private method.
+        :param state: a (position, medals) state
+        :return: (number) the lower bound
+        """
+        bound = self.bounds.get(state)
+        if bound is not None:
+            return bound
+        position, medals = state
+        cell = self.problem.maze.index(position)
+        start = self.start[0]
+        bound = x_cost(start, position, self.problem) + \
+            y_cost(start, position, self.problem)
+        for to_start, to_medal, from_start, from_medal in self.landmarks:
+            # the tables are lower bounds, a table entry of infinity
+            # tells nothing about the others
+            if to_medal[cell] < math.inf:
+                bound = max(bound, to_start - to_medal[cell])
+            if from_start < math.inf:
+                bound = max(bound, from_medal[cell] - from_start)
+        collected = [detour for detour in self.detours
+                     if not medals & detour[0]]
+        for i, (bit, to_first, from_first, first) in enumerate(collected):
+            bound = max(bound, to_first + from_first[cell])
+            for bit, to_second, from_second, second in collected[:i]:
+                bound = max(bound, min(
+                    to_first + from_first[second] + from_second[cell],
+                    to_second + from_second[first] + from_first[cell]))
+        self.bounds[state] = bound
+        return bound
+
+    def _key(self, state):
+        """
+        Return the D* Lite priority of the given state
+        This is a private method.
+        :param state: a (position, medals) state
+        :return: (tuple) the priority
+        """
+        best = min(self._cost(state), self.rhs.get(state, math.inf))
+        return (best + self._lower_bound(state) + self.km, best)
+
+    def _successors(self, state):
+        """
+        Return the (state, action, cost) moves out of the given state
+        This is a private method.
+        """
+        return self.problem.expand(state)
+
+    def _predecessors(self, state):
+        """
+        Return the states with a move to the given state
+        This is a private method.
+        :param state: a (position, medals) state
+        :return: list of (state, action cost) tuples
+        """
+        position, medals = state
+        maze = self.problem.maze
+        bit = self._bit(position)
+        if medals & bit:
+            return []  # Sammy is at his start, no move leads here
+        result = []
+        for source, action, action_cost in \
+                maze.predecessors[maze.index(position)]:
+            other = maze.positions[source]
+            for other_medals in (medals, medals | bit) if bit else (medals,):
+                other_state = (other, other_medals)
+                # Sammy only stands on a medal before collecting it at
+                # his start, and a path to a goal never goes through a
+                # state with no medal left
+                if other_medals and (not other_medals & self._bit(other) or
+                                     other_state == self.start):
+                    result.append((other_state, action_cost))
+        return result
+
+    def _update_state(self, state):
+        """
+        Recompute the lookahead cost of a state and queue it if it is
+        inconsistent
+        This is a private method.
+        :param state: a (position, medals) state
+        :return: None
+        """
+        position, medals = state
+        self.masks[position].add(medals)
+        if medals == 0 and not self.problem.maze.is_wall(position):
+            self.rhs[state] = 0  # a goal state
+        else:
+            self.rhs[state] = min(
+                [action_cost + self._cost(child_state)
+                 for child_state, action, action_cost
+                 in self._successors(state)], default=math.inf)
+        if self.fringe.contains(state):
+            self.fringe.remove(state)
+        if self._cost(state) != self.rhs[state]:
+            self.fringe.push(state, state, self._key(state))
+
+    def _compute_shortest_path(self):
+        """
+        Search until Sammy's state is consistent and no queued state
+        can lower its cost
+        This is a private method.
+        :return: None
+        """
+        fringe = self.fringe
+        start = self.start
+        while not fringe.is_empty() and (
+                fringe.min_priority() < self._key(start) or
+                self.rhs.get(start, math.inf) != self._cost(start)):
+            old_key = fringe.min_priority()
+            state = fringe.pop()
+            new_key = self._key(state)
+            if old_key < new_key:
+                fringe.push(state, state, new_key)
+            elif self._cost(state) > self.rhs[state]:
+                self.g[state] = self.rhs[state]
+                for other, action_cost in self._predecessors(state):
+                    self._update_state(other)
+            else:
+                self.g[state] = math.inf
+                self._update_state(state)
+                for other, action_cost in self._predecessors(state):
+                    self._update_state(other)
+
+
 def null_heuristic(state, problem):
     """
     Trivial heuristic to be used with A*.
@@ -53,7 +1147,7 @@ def null_heuristic(state, problem):
     :param
     state: A state is represented by a tuple containing:
                 the current position of Sammy the Spartan
-                a tuple containing the positions of the remaining medals
+                an int bitmask of the remaining medals
     problem: (a Problem object) representing the quest
     :return: 0
     """
@@ -85,15 +1179,16 @@ def single_heuristic(state, problem):
     :param
     state: A state is represented by a tuple containing:
                 the current position of Sammy the Spartan
-                a tuple containing the positions of the remaining medals
+                an int bitmask of the remaining medals
     problem: (a Problem object) representing the quest
 
     :return: int
     """
     # Enter your code here and remove the pass statement below
     sammy_pos, remaining_medals = state
-    if len(remaining_medals) == 1:
-        medal, = remaining_medals
+    # exactly one bit set in the bitmask
+    if remaining_medals and not remaining_medals & (remaining_medals - 1):
+        medal = problem.medal_list[remaining_medals.bit_length() - 1]
         return manhattan_distance(sammy_pos, medal)
     else:
         return 0
@@ -152,7 +1247,7 @@ def better_heuristic(state, problem):
     :param
     state: A state is represented by a tuple containing:
                 the current position of Sammy the Spartan
-                a tuple containing the positions of the remaining medals
+                an int bitmask of the remaining medals
     problem: (a Problem object) representing the quest
 
     :return: int
@@ -160,7 +1255,7 @@ def better_heuristic(state, problem):
     # Enter your code here and remove the pass statement below
     sammy_pos, remaining_medals = state
     if not problem.is_goal(state):
-        medal, = remaining_medals
+        medal, = problem.remaining_medals(state)
         return x_cost(sammy_pos, medal, problem) + y_cost(sammy_pos, medal, problem)
     else:
         return 0
@@ -173,7 +1268,7 @@ def gen_heuristic(state, problem):
     :param
     state: A state is represented by a tuple containing:
                 the current position of Sammy the Spartan
-                a tuple containing the positions of the remaining medals
+                an int bitmask of the remaining medals
     problem: (a Problem object) representing the quest
 
     :return: int
@@ -181,4 +1276,90 @@ def gen_heuristic(state, problem):
     # Enter your code here and remove the pass statement below
     sammy, medals = state
     # return min([manhattan_distance(sammy, medal)*direction(sammy, medal, problem) for medal in medals], default=0)
-    return max((x_cost(sammy, medal, problem)+y_cost(sammy, medal, problem) for medal in medals), default=0)
+    return max((x_cost(sammy, medal, problem)+y_cost(sammy, medal, problem)
+                for medal in problem.remaining_medals(state)), default=0)
+
+
+def mst_heuristic(state, problem):
+    """
+    Return the larger of two lower bounds on the cost of collecting
+    the remaining medals, both based on true maze costs:
+    - the cost from Sammy to the farthest remaining medal
+    - the cost from Sammy to the nearest remaining medal plus the
+      weight of a minimum spanning tree over the remaining medals.
+      The weight of the edge between two medals is the cheaper of the
+      two directed maze costs between them.
+    Any path collecting the medals goes to a first medal and then
+    follows a spanning path of the medals, so neither bound exceeds
+    the true cost.  Both are consistent and so is their maximum, so
+    the closed set in astar stays correct.
+    The maze costs come from problem.medal_distances() which runs one
+    Dijkstra search per medal the first time it is called.
+    :param
+    state: A state is represented by a tuple containing:
+                the current position of Sammy the Spartan
+                an int bitmask of the remaining medals
+    problem: (a Problem object) representing the quest
+
+    :return: int (math.inf if a medal cannot be reached)
+    """
+    sammy, medals = state
+    if not medals:
+        return 0
+    table = problem.medal_distances()
+    maze = problem.maze
+    remaining = [i for i in range(len(problem.medal_list)) if medals >> i & 1]
+    cells = [maze.index(problem.medal_list[i]) for i in remaining]
+    sammy_cell = maze.index(sammy)
+    to_medals = [table[i][sammy_cell] for i in remaining]
+    # Prim's algorithm over the remaining medals
+    tree_cost = 0
+    best = {j: min(table[remaining[0]][cells[j]],
+                   table[remaining[j]][cells[0]])
+            for j in range(1, len(remaining))}
+    while best:
+        j = min(best, key=best.get)
+        tree_cost += best.pop(j)
+        for other in best:
+            best[other] = min(best[other],
+                              table[remaining[j]][cells[other]],
+                              table[remaining[other]][cells[j]])
+    return max(max(to_medals), min(to_medals) + tree_cost)
+
+
+def alt_heuristic(state, problem):
+    """
+    Landmark (ALT) heuristic
+    For a landmark L, the triangle inequality gives two lower bounds on
+    the cost d(sammy, medal):
+        d(L, medal) - d(L, sammy)  and  d(sammy, L) - d(medal, L)
+    Moves have directional costs, so the first bound uses the table of
+    costs from the landmarks and the second the table of costs to the
+    landmarks.  All the medals must be collected, so the heuristic is
+    the largest bound over the landmarks and the remaining medals.
+    It is admissible and consistent.
+    The tables come from problem.landmark_distances(), which is cached
+    on disk per maze file.
+    :param
+    state: A state is represented by a tuple containing:
+                the current position of Sammy the Spartan
+                an int bitmask of the remaining medals
+    problem: (a Problem object) representing the quest
+
+    :return: int
+    """
+    sammy, medals = state
+    if not medals:
+        return 0
+    forward, backward = problem.landmark_distances()
+    sammy_cell = problem.maze.index(sammy)
+    best = 0
+    for medal in problem.remaining_medals(state):
+        medal_cell = problem.maze.index(medal)
+        for from_landmark, to_landmark in zip(forward, backward):
+            if from_landmark[sammy_cell] < 0 or from_landmark[medal_cell] < 0:
+                continue  # not in the landmark's part of the maze
+            best = max(best,
+                       from_landmark[medal_cell] - from_landmark[sammy_cell],
+                       to_landmark[sammy_cell] - to_landmark[medal_cell])
+    return best
@@ -0,0 +1,217 @@
+# ----------------------------------------------------------------------
+# Name:     quest_server
+# Purpose:  Answer many quest queries with the mazes kept in memory
+#
+# Author: Byron O'Gorman
+# ----------------------------------------------------------------------
+"""
+Resident pathfinding service
+
+Usage:  quest_server.py [--socket PATH | --port PORT] [--workers N]
+                        maze_file ...
+        quest_server.py [--socket PATH | --port PORT] --ask QUERY
+
+The server reads the maze files once in each worker process and keeps
+the Problem objects and their distance tables in memory.  It listens on
+a Unix socket (or on a localhost TCP port) for queries and answers them
+with a pool of worker processes, so that several queries are solved at
+the same time.
+
+Queries and answers are JSON objects, one per line.  A query holds:
+    maze: the name of a maze file given to the server
+    algorithm: a search algorithm, astar by default, one of
+        UNINFORMED_SEARCHES or INFORMED_SEARCHES
+    heuristic: for the informed search algorithms, one of HEURISTICS,
+        null_heuristic by default
+    start: [x, y] Sammy's position, optional
+    medals: [[x, y], ...] the positions of the medals left, optional
+The answer holds the solution (a list of actions), its cost, the
+number of nodes expanded and the processing time in seconds, or an
+error message.
+
+Example:  quest_server.py --socket /tmp/quest.sock questB.txt questF.txt
+          quest_server.py --socket /tmp/quest.sock --ask
+              '{"maze": "questB.txt", "algorithm": "held_karp"}'
+"""
+import os
+import json
+import time
+import socket
+import asyncio
+import argparse
+import concurrent.futures
+import uninformed_search
+import informed_search
+from spartanquest import Problem
+
+quests = {}  # maze name -> Problem, in each worker process
+
+# the search algorithms and heuristics a query may name
+UNINFORMED_SEARCHES = {'dfs', 'bfs', 'layered_bfs', 'ucs',
+                       'bidirectional_ucs', 'external_ucs', 'held_karp'}
+INFORMED_SEARCHES = {'astar', 'ida_star', 'ara_star', 'frontier_astar'}
+HEURISTICS = {'null_heuristic', 'single_heuristic', 'better_heuristic',
+              'gen_heuristic', 'mst_heuristic', 'alt_heuristic'}
+
+
+def load_quests(maze_files):
+    """
+    Read the maze files and compute their medal distance and landmark
+    tables.  Runs once in each worker process.  The tables are kept on
+    the quests, and shared by the variants made for each query.
+    :param maze_files (list of strings): names of the maze files
+    :return: None
+    """
+    for maze_file in maze_files:
+        quest = Problem(open(maze_file))
+        # the queries may start anywhere: keep every cell in the tables
+        quest.maze.build_neighbors(quest.moves, quest.cost)
+        quest.medal_distances()
+        quest.landmark_distances()
+        quests[os.path.basename(maze_file)] = quest
+
+
+def cache_landmarks(maze_files):
+    """
+    Compute the landmark tables of each maze and cache them on disk,
+    before the worker processes start, so that the workers read them
+    from the cache instead of each computing and writing them.
+    :param maze_files (list of strings): names of the maze files
+    :return: None
+    """
+    for maze_file in maze_files:
+        Problem(open(maze_file)).landmark_distances()
+
+
+def solve(query):
+    """
+    Answer a query with the quests of this worker process
+    :param query (dictionary): the query, see the module docstring
+    :return: (dictionary) the answer
+    """
+    try:
+        quest = quests[query['maze']].variant(query.get('start'),
+                                             query.get('medals'))
+        algorithm = query.get('algorithm', 'astar')
+        heuristic = query.get('heuristic', 'null_heuristic')
+        start_time = time.perf_counter()
+        if algorithm in UNINFORMED_SEARCHES:
+            solution = getattr(uninformed_search, algorithm)(quest)
+        elif algorithm not in INFORMED_SEARCHES:
+            raise ValueError(f'unknown search algorithm {algorithm!r}')
+        elif heuristic not in HEURISTICS:
+            raise ValueError(f'unknown heuristic {heuristic!r}')
+        else:
+            solution = getattr(informed_search, algorithm)(
+                quest, getattr(informed_search, heuristic))
+        elapsed_time = time.perf_counter() - start_time
+        cost = None if solution is None else quest.path_cost(solution)
+    except (KeyError, AttributeError, TypeError, ValueError) as error:
+        return {'error': f'bad query: {error!r}'}
+    return {'solution': solution,
+            'cost': cost,
+            'nodes_expanded': quest.nodes_expanded(),
+            'time': elapsed_time}
+
+
+async def serve(pool, arguments):
+    """
+    Accept connections and answer their queries until interrupted
+    :param
+    pool (concurrent.futures.Executor): the worker processes
+    arguments (argparse.Namespace): the command line arguments
+    :return: None
+    """
+    loop = asyncio.get_running_loop()
+
+    async def answer(reader, writer):
+        # the queries of a connection are answered in order, the
+        # connections are served at the same time
+        while line := await reader.readline():
+            try:
+                query = json.loads(line)
+            except ValueError as error:
+                result = {'error': f'bad query: {error}'}
+            else:
+                try:
+                    result = await loop.run_in_executor(pool, solve, query)
+                except Exception as error:  # reply instead of hanging up
+                    result = {'error': f'query failed: {error!r}'}
+            writer.write(json.dumps(result).encode() + b'\n')
+            await writer.drain()
+        writer.close()
+
+    if arguments.port:
+        server = await asyncio.start_server(answer, '127.0.0.1',
+                                            arguments.port)
+    else:
+        server = await asyncio.start_unix_server(answer, arguments.socket)
+    async with server:
+        await server.serve_forever()
+
+
+def ask(query, path=None, port=None):
+    """
+    Send a query to a running server and wait for the answer
+    :param
+    query (dictionary): the query, see the module docstring
+    path (string): the server Unix socket
+    port (int): the server localhost TCP port, used if path is None
+    :return: (dictionary) the answer
+    """
+    if path is None:
+        connection = socket.create_connection(('127.0.0.1', port))
+    else:
+        connection = socket.socket(socket.AF_UNIX)
+        connection.connect(path)
+    with connection, connection.makefile('rwb') as stream:
+        stream.write(json.dumps(query).encode() + b'\n')
+        stream.flush()
+        return json.loads(stream.readline())
+
+
+def get_arguments():
+    """
+    Parse the command line arguments
+    :return: (argparse.Namespace) the arguments specified
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('maze_files',
+                        help='names of the text files containing the mazes',
+                        nargs='*')
+    parser.add_argument('--socket',
+                        help='Unix socket to listen on',
+                        default='/tmp/spartanquest.sock')
+    parser.add_argument('--port',
+                        help='localhost TCP port to listen on instead',
+                        type=int)
+    parser.add_argument('--workers',
+                        help='number of worker processes',
+                        type=int,
+                        default=os.cpu_count())
+    parser.add_argument('--ask',
+                        help='send this JSON query to a running server')
+    return parser.parse_args()
+
+
+def main():
+    arguments = get_arguments()
+    if arguments.ask:
+        print(json.dumps(ask(json.loads(arguments.ask),
+                             None if arguments.port else arguments.socket,
+                             arguments.port)))
+        return
+    if not arguments.port and os.path.exists(arguments.socket):
+        os.remove(arguments.socket)  # left over by a previous server
+    cache_landmarks(arguments.maze_files)
+    with concurrent.futures.ProcessPoolExecutor(
+            arguments.workers, initializer=load_quests,
+            initargs=(arguments.maze_files,)) as pool:
+        try:
+            asyncio.run(serve(pool, arguments))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -14,24 +14,239 @@ The maze_file is a text file such as SJSU.txt
 The search_algorithm in homework 3 is:
     dfs: for depth first search
     bfs: for breadth first search
+    layered_bfs: for breadth first search one layer at a time
     ucs for uniform cost search
+    bidirectional_ucs: for uniform cost search from both ends
+        (single medal quests)
+    external_ucs: for uniform cost search with its fringe and closed
+        set on disk (very large state spaces)
+    held_karp: for the optimal medal collection order by dynamic
+        programming (quests with up to about 20 medals)
 The search_algorithm in homework 4 is:
     astar: for A*  search
+    ida_star: for iterative deepening A* search (low memory)
+    ara_star: for anytime weighted A* search
+    hpa_star: for hierarchical A* search over clusters of the maze
+        (near optimal, for very large mazes)
+    parallel_astar: for A* search distributed over worker processes
+    frontier_astar: for A* search without a closed set (low memory)
+    portfolio: race several search algorithm and heuristic pairs in
+        parallel processes and keep the first optimal solution
+An optional heuristic name can follow the search_algorithm.
 
 Example:  spartanquest.py SJSU.txt dfs
 
+Options:
+    --cache-size N: cache up to N heuristic values (least recently used
+        values are evicted first)
+    --table-size N: ida_star transposition table size, 10000 states by
+        default, 0 for no table
+    --weight W: ara_star initial heuristic weight
+    --time-limit T, --node-limit N: ara_star budget.  ara_star stops at
+        the optimal solution or when the budget runs out.  --time-limit
+        is also the portfolio deadline.
+    --corridors: search a compressed maze graph where corridors are
+        contracted into single macro-edges
+    --cluster-size N: hpa_star cluster width and height
+    --workers N: number of parallel_astar worker processes
+    --solution-cache [FILE]: reuse the solutions found by previous runs
+        with the same maze, move costs and search options (see
+        SEARCH_OPTIONS), kept in FILE (spartanquest.solutions by default)
+    --cache-entries N: solution cache size, the least recently used
+        solutions are evicted first
+    --memory-limit MB: external_ucs records kept in memory, roughly
+    --dominance: ucs and astar prune the states dominated by a state at
+        the same position with fewer medals left reached at no more cost
+    --configurations A:H,...: the portfolio, e.g. astar:gen_heuristic,ucs
+    --portfolio-log FILE: the portfolio winners are appended to FILE
+
 The uninformed search algorithms functions are implemented in the file
 uninformed_search.py.
 
 Your task for homework 4 is to implement astar in informed_search.py.
 
 """
+import os
+import copy
 import time
+import math
+import queue
+import heapq
+import pickle
+import struct
+import hashlib
 import argparse
+import collections
+import multiprocessing
+from array import array
+import numpy as np
 import uninformed_search
 import informed_search
 import graphics
 
+class Positions(dict):
+    """
+    The position (x, y) of every cell of a maze, computed from the
+    cell index the first time it is looked up rather than stored for
+    every cell.  The positions looked up are cached in the dictionary.
+
+    Arguments:
+    width (int):  the width of the maze
+    height (int): the height of the maze
+    """
+    def __init__(self, width, height):
+        super().__init__()
+        self.width = width
+        self.height = height
+
+    def __len__(self):
+        return self.width * self.height
+
+    def __missing__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        y, x = divmod(index, self.width)
+        self[index] = (x, y)
+        return (x, y)
+
+    def __iter__(self):
+        for y in range(self.height):
+            for x in range(self.width):
+                yield (x, y)
+
+
+class MoveTable(dict):
+    """
+    Adjacency table of a maze in compressed sparse row (CSR) form, with
+    room for every action in each row
+
+    Row i holds the moves out of cell i: they are the entries
+    i * slots to i * slots + counts[i] - 1 of the targets, codes and
+    costs arrays, where codes[k] is the index of the action in actions.
+    Since every row has the same capacity, a row can be rewritten in
+    place when the walls around a cell change.  table[i] returns the
+    moves of cell i as a tuple of (target_index, action, cost) tuples.
+    These tuples are only built for the cells a search looks at, and
+    cached in the dictionary.
+
+    Arguments:
+    actions (list of strings): the actions in code order
+    sources, targets, codes, costs (NumPy arrays): one element per
+        move, sorted by source cell
+    cell_count (int): the number of cells of the maze
+
+    Attributes:
+    actions (list of strings): the actions in code order
+    slots (int): the capacity of a row, the number of actions
+    counts (array): counts[i] is the number of moves out of cell i
+    targets, codes, costs (arrays): the rows, kept as array.array so
+        that reading an element gives a Python number
+    """
+    def __init__(self, actions, sources, targets, codes, costs,
+                 cell_count):
+        super().__init__()
+        self.actions = actions
+        self.slots = slots = len(actions)
+        counts = np.bincount(sources, minlength=cell_count)
+        # the position of each move within its row
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        entries = sources * slots + np.arange(len(sources)) - \
+            starts[sources]
+        padded = np.full(cell_count * slots, -1, np.dtype('i'))
+        padded[entries] = targets
+        self.counts = self._array('b', counts)
+        self.targets = self._array('i', padded)
+        padded = np.zeros(cell_count * slots, np.dtype('b'))
+        padded[entries] = codes
+        self.codes = self._array('b', padded)
+        padded = np.zeros(cell_count * slots, costs.dtype)
+        padded[entries] = costs
+        if costs.dtype.kind in 'iub':
+            self.costs = self._array('q', padded)
+        else:
+            self.costs = self._array('d', padded)
+
+    @staticmethod
+    def _array(typecode, values):
+        """
+        Convert a NumPy array to an array.array
+        This is a private method.
+        :param
+        typecode (string): the array.array type code
+        values (NumPy array): the values
+        :return: (array) the values
+        """
+        converted = array(typecode)
+        values = np.ascontiguousarray(values, np.dtype(typecode))
+        converted.frombytes(memoryview(values).cast('B'))
+        return converted
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __missing__(self, cell):
+        start = cell * self.slots
+        end = start + self.counts[cell]
+        actions = self.actions
+        moves = tuple(zip(self.targets[start:end],
+                          [actions[code] for code in self.codes[start:end]],
+                          self.costs[start:end]))
+        self[cell] = moves
+        return moves
+
+    def set_row(self, cell, moves):
+        """
+        Replace the moves out of the given cell
+        :param
+        cell (int): the index of the cell
+        moves (list): a (target_index, code, cost) tuple for each move,
+            in the order they should be listed
+        :return: None
+        """
+        start = cell * self.slots
+        for entry, (target, code, cost) in enumerate(moves, start):
+            self.targets[entry] = target
+            self.codes[entry] = code
+            self.costs[entry] = cost
+        self.counts[cell] = len(moves)
+        self.pop(cell, None)  # the cached tuple is out of date
+
+    def arrays(self):
+        """
+        Return the table in compact CSR form, as NumPy arrays: the moves
+        out of cell i are the entries offsets[i] to offsets[i + 1] - 1
+        of the targets, codes and costs arrays.
+        :return: (tuple) the offsets, targets, codes and costs arrays
+        """
+        counts = np.frombuffer(self.counts, np.dtype('b'))
+        used = (np.arange(self.slots) < counts[:, None]).ravel()
+        return (np.concatenate(([0], np.cumsum(counts))).astype('i'),
+                np.frombuffer(self.targets, np.dtype('i'))[used],
+                np.frombuffer(self.codes, np.dtype('b'))[used],
+                np.frombuffer(self.costs,
+                              np.dtype(self.costs.typecode))[used])
+
+    def sources(self):
+        """
+        Return the cell each move starts from, in the order of arrays()
+        :return: (NumPy array) sources[k] is the cell of move k
+        """
+        counts = np.frombuffer(self.counts, np.dtype('b'))
+        return np.repeat(np.arange(len(self), dtype=np.dtype('i')), counts)
+
+    def reverse(self):
+        """
+        Return the reverse table: entry i lists the moves into cell i
+        as (source_index, action, cost) tuples, by source index.
+        :return: (MoveTable) the reverse table
+        """
+        offsets, targets, codes, costs = self.arrays()
+        order = np.argsort(targets, kind='stable')  # sources stay sorted
+        return MoveTable(self.actions, targets[order],
+                         self.sources()[order], codes[order], costs[order],
+                         len(self))
+
+
 class Maze(object):
     """
     Represent the maze layout: its width, height and walls
@@ -39,22 +254,216 @@ class Maze(object):
     Arguments:
     width (int):  the width of the maze
     height (int): the height of the maze
+    walls (NumPy array of booleans): optional, walls[y, x] is True
+        when there is a wall at position (x, y).  No walls by default.
 
     Attributes:
     width (int):  the width of the maze
     height (int): the height of the maze
-    walls (two dimensional list of booleans):
+    walls (two dimensional NumPy array of booleans):
         Each element represents a position in the maze.
         True indicates that there is a wall in that position.
         False indicates the absence of a wall.
-        self.walls[x][y] indicates the presence or absence of a wall
+        self.walls[y, x] indicates the presence or absence of a wall
         at position (x, y) in the maze.
+    positions (Positions): the position (x, y) of every cell,
+        cell (x, y) has the index y * width + x
+    neighbors (MoveTable): the adjacency table built by
+        build_neighbors.  neighbors[i] holds a (target_index, action,
+        cost) tuple for each legal move out of cell i.
+        It is empty for wall cells.
+    predecessors (MoveTable): the reverse of the adjacency table, built
+        the first time it is used.  predecessors[i] holds a
+        (source_index, action, cost) tuple for each legal move into
+        cell i.
     """
-    def __init__(self, width, height):
-        self.walls = [[False for x in range(width)]
-                      for y in range(height)]
+    def __init__(self, width, height, walls=None):
+        if walls is None:
+            self.walls = np.zeros((height, width), bool)
+        else:
+            self.walls = np.asarray(walls, bool)
         self.width = width
         self.height = height
+        self.positions = Positions(width, height)
+        self.neighbors = None
+        self._predecessors = None  # built on demand
+        self._moves = None  # the moves and costs the tables are built for
+        self._reachable = None  # the cells the tables are restricted to
+
+    @property
+    def predecessors(self):
+        if self._predecessors is None:
+            self._predecessors = self.neighbors.reverse()
+        return self._predecessors
+
+    def index(self, position):
+        """
+        Return the flat index of the given position
+        :param position: tuple (x, y) representing a maze position
+        :return: (int) the index of that cell in positions and neighbors
+        """
+        x, y = position
+        return y * self.width + x
+
+    def build_neighbors(self, moves, cost):
+        """
+        Build the adjacency table listing the legal moves out of each
+        open cell with their cost and target cell index.
+        This is done once per maze so that expanding a state is a
+        table lookup.  It must be called again if the walls change.
+        The table is built in one vectorized pass: shifting the open
+        cells grid by each move gives the cells where that move is
+        legal.
+        :param
+        moves (dictionary): maps each action to its (dx, dy) offset
+        cost (dictionary): maps each action to its cost
+        :return: None
+        """
+        self._moves = (moves, cost)
+        self._reachable = None
+        self._build_tables()
+
+    def _build_tables(self):
+        """
+        Build the CSR arrays of the adjacency table from the walls and
+        the cells the tables are restricted to.
+        This is a private method.
+        :return: None
+        """
+        moves, cost = self._moves
+        width, height = self.width, self.height
+        open_cells = ~self.walls
+        if self._reachable is not None:
+            open_cells &= self._reachable.reshape(height, width)
+        actions = list(moves)
+        legal = np.zeros((height, width, len(actions)), bool)
+        for code, action in enumerate(actions):
+            dx, dy = moves[action]
+            if abs(dx) >= width or abs(dy) >= height:
+                continue
+            # cell (x, y) moves to (x + dx, y + dy) if both are open
+            rows, columns = slice(max(0, -dy), height - max(0, dy)), \
+                slice(max(0, -dx), width - max(0, dx))
+            legal[rows, columns, code] = open_cells[rows, columns] & \
+                open_cells[max(0, dy):height - max(0, -dy),
+                           max(0, dx):width - max(0, -dx)]
+        legal = legal.reshape(width * height, len(actions))
+        cells, codes = np.divmod(np.flatnonzero(legal), len(actions))
+        steps = np.array([dy * width + dx for dx, dy in moves.values()])
+        costs = np.array([cost[action] for action in actions])
+        self.neighbors = MoveTable(actions, cells, cells + steps[codes],
+                                   codes, costs[codes], width * height)
+        self._predecessors = None
+
+    def distances_from(self, index):
+        """
+        Return the cost of the cheapest path from the given cell to
+        every cell of the maze (Dijkstra's algorithm over the neighbor
+        table).
+        :param index: (int) the index of the source cell
+        :return: list of numbers indexed by cell, math.inf for cells
+        that cannot be reached
+        """
+        return self._dijkstra(index, self.neighbors)
+
+    def distances_to(self, index):
+        """
+        Return the cost of the cheapest path from every cell of the
+        maze to the given cell.  Moves have directional costs so this
+        runs Dijkstra's algorithm over the predecessors table.
+        :param index: (int) the index of the target cell
+        :return: list of numbers indexed by cell, math.inf for cells
+        that cannot reach the target
+        """
+        return self._dijkstra(index, self.predecessors)
+
+    def _dijkstra(self, index, edges):
+        """
+        Single source shortest path costs over the given edge table
+        The rows are read directly, so no move tuples are built.
+        This is a private method.
+        :param
+        index: (int) the index of the source cell
+        edges: (MoveTable) neighbors or predecessors
+        :return: list of numbers indexed by cell
+        """
+        slots, counts = edges.slots, edges.counts
+        targets, costs = edges.targets, edges.costs
+        distances = [math.inf] * len(self.positions)
+        distances[index] = 0
+        fringe = [(0, index)]
+        while fringe:
+            distance, cell = heapq.heappop(fringe)
+            if distance > distances[cell]:
+                continue  # stale entry
+            start = cell * slots
+            for edge in range(start, start + counts[cell]):
+                other = targets[edge]
+                if distance + costs[edge] < distances[other]:
+                    distances[other] = distance + costs[edge]
+                    heapq.heappush(fringe, (distances[other], other))
+        return distances
+
+    def reachable_from(self, index):
+        """
+        Flood fill the maze from the given cell, one breadth first
+        layer at a time with NumPy array operations
+        :param index: (int) the index of the cell to start from
+        :return: (NumPy array of booleans) element i is True if cell i
+        can be reached, False otherwise
+        """
+        offsets, targets, codes, costs = self.neighbors.arrays()
+        reachable = np.zeros(len(self.positions), bool)
+        reachable[index] = True
+        first = np.zeros(len(self.positions), np.int64)  # to drop repeats
+        layer = np.array([index])
+        while len(layer):
+            starts = offsets[layer]
+            counts = offsets[layer + 1] - starts
+            # the edge numbers of every move out of the layer
+            edges = np.arange(counts.sum()) + \
+                np.repeat(starts - np.cumsum(counts) + counts, counts)
+            layer = targets[edges]
+            layer = layer[~reachable[layer]]
+            # keep one copy of each cell: the last write wins
+            first[layer] = np.arange(len(layer))
+            layer = layer[first[layer] == np.arange(len(layer))]
+            reachable[layer] = True
+        return reachable
+
+    def restrict(self, reachable):
+        """
+        Drop the cells that cannot be reached from the neighbor and
+        predecessors tables, so that later searches never look at them.
+        :param reachable: (NumPy array) as returned by reachable_from
+        :return: None
+        """
+        reachable = np.asarray(reachable, bool)
+        degrees = np.frombuffer(self.neighbors.counts, np.dtype('b'))
+        if degrees[~reachable].any():  # some cells need to be dropped
+            self._reachable = reachable
+            self._build_tables()
+
+    def in_tables(self, index):
+        """
+        Is the given cell kept in the neighbor and predecessors tables,
+        that is, not dropped by restrict?
+        :param index: (int) the index of the cell
+        :return: (Boolean) True if the cell is in the tables
+        """
+        return self._reachable is None or bool(self._reachable[index])
+
+    def unrestricted(self):
+        """
+        Return this maze if its tables were not restricted, or else a
+        copy with tables for every open cell
+        :return: (Maze) the maze with full tables
+        """
+        if self._reachable is None:
+            return self
+        maze = copy.copy(self)
+        maze.build_neighbors(*self._moves)
+        return maze
 
     def add_wall(self, position):
         """
@@ -63,7 +472,70 @@ class Maze(object):
         :return: None
         """
         x, y = position
-        self.walls[y][x] = True
+        self.walls[y, x] = True
+
+    def remove_wall(self, position):
+        """
+        Remove the wall in the specified position
+        :param position: tuple(row, column) representing a maze position
+        :return: None
+        """
+        x, y = position
+        self.walls[y, x] = False
+
+    def update_neighbors(self, position, moves, cost):
+        """
+        Update the adjacency table after a wall was added or removed
+        at the given cell.  Only the rows of that cell and of the cells
+        one move away change, so only those rows are rewritten, in the
+        neighbors table and in the predecessors table if it was built.
+        The tables are rebuilt from scratch if they were built for other
+        moves or restricted to the reachable cells, since a wall change
+        can make dropped cells reachable again.
+        :param
+        position: tuple (x, y) of the cell whose wall changed
+        moves (dictionary): maps each action to its (dx, dy) offset
+        cost (dictionary): maps each action to its cost
+        :return: None
+        """
+        if self.neighbors is None or self._reachable is not None or \
+                self._moves != (moves, cost):
+            self.build_neighbors(moves, cost)
+            return
+        x, y = position
+        cells = {self.index(position)}
+        for dx, dy in moves.values():
+            for other in ((x + dx, y + dy), (x - dx, y - dy)):
+                if self.within_bounds(other):
+                    cells.add(self.index(other))
+        for cell in cells:
+            self.neighbors.set_row(cell, self._row(cell, 1))
+            if self._predecessors is not None:
+                self._predecessors.set_row(cell, self._row(cell, -1))
+
+    def _row(self, cell, direction):
+        """
+        List the legal moves out of (direction 1) or into (direction -1)
+        the given cell, in the order build_neighbors lists them.
+        This is a private method.
+        :param
+        cell (int): the index of the cell
+        direction (int): 1 for the neighbors table, -1 for predecessors
+        :return: (list) a (cell_index, code, cost) tuple for each move
+        """
+        moves, cost = self._moves
+        x, y = self.positions[cell]
+        row = []
+        if self.walls[y, x]:
+            return row
+        for code, action in enumerate(moves):
+            dx, dy = moves[action]
+            other = (x + direction * dx, y + direction * dy)
+            if self.within_bounds(other) and not self.is_wall(other):
+                row.append((self.index(other), code, cost[action]))
+        if direction < 0:
+            row.sort(key=lambda move: move[0])  # by source, as reverse()
+        return row
 
     def is_wall(self, position):
         """
@@ -73,7 +545,7 @@ class Maze(object):
         False otherwise
         """
         x, y = position
-        return self.walls[y][x]
+        return bool(self.walls[y, x])
 
     def within_bounds(self, position):
         """
@@ -99,6 +571,13 @@ class Problem(object):
     mascot_position (tuple of integers): the current position of Sammy
     medals (a set of tuples): a set containing the positions of the
     remaining medals in the quest
+    medal_list (list of tuples): the medal positions in a fixed order,
+    medal i is represented by bit i in a state's medal bitmask
+    medal_bits (dictionary): maps each medal position to its bit
+    unreachable_medals (a set of tuples): the positions of the medals
+    that cannot be reached from Sammy's starting position, found again
+    by a flood fill the first time it is read after the walls change
+    maze_name (string): the name of the maze file, None if unknown
     """
     NORTH = "N"
     SOUTH = "S"
@@ -109,10 +588,18 @@ class Problem(object):
     # The cost (number of carrots consumed) associated with each move.
     cost = {EAST: 15, WEST: 1, SOUTH: 2, NORTH: 14}
 
+    landmark_count = 4  # number of landmarks used by the ALT heuristic
+
     def __init__(self, mazefile):
         self._nodes_expanded = 0 # private variable
+        self._medal_distances = None  # computed on demand
+        self._distances_to = {}  # medal position -> its distance table
+        self._landmarks = None  # computed on demand
+        self._unreachable_medals = None  # computed on demand
         self.medals = set()
         self.read_quest(mazefile)
+        self.index_medals()
+        self.check_reachability()
 
     def read_quest(self, mazefile):
         """
@@ -126,28 +613,115 @@ class Problem(object):
         M or m: represent the presence of a medal at that position
         S or s: represent the starting position of our mascot Sammy
         Any other character: a vacant maze position
+        The maze is turned into a grid of bytes (see read_grid), then
+        the walls, medals and Sammy are found with NumPy array
+        operations.  The wall grid is kept as an array and the move
+        tables are built from it in a vectorized pass as well.
         :param
         mazefile (file object): the file object containing the maze info
         :return: None
         """
-        layout = mazefile.readlines()
-        width = len(layout[0].strip()) # the first line
-        height = len(layout) # the number of lines represents the height
-        self.maze = Maze(width, height)
-        y = 0
-        for line in layout:
-            x = 0
-            for char in line:
-                if char in {'W', 'w'}: # W represents a wall
-                    self.maze.add_wall((x, y))
-                elif char in {'M', 'm'}: # M represents a medal position
-                    self.add_medal((x, y))
-                elif char in {'S', 's'}: # S represents Sammy's position
-                    self.add_mascot((x, y))
-                x += 1 # anything else is a vacant maze position
-            y += 1
+        self.maze_name = getattr(mazefile, 'name', None)
+        grid = self.read_grid(mazefile)
         mazefile.close()
+        height, width = grid.shape
+        self.maze = Maze(width, height, grid == ord('W'))
+        for y, x in np.argwhere(grid == ord('M')).tolist():
+            self.add_medal((x, y))
+        mascot = np.argwhere(grid == ord('S'))
+        if len(mascot):  # the last S in the file is Sammy's position
+            y, x = mascot[-1].tolist()
+            self.add_mascot((x, y))
+        self.maze.build_neighbors(self.moves, self.cost)
+
+    def read_grid(self, mazefile):
+        """
+        Return the maze as a NumPy uint8 array: grid[y, x] is ord('W')
+        for a wall, ord('M') for a medal, ord('S') for Sammy and
+        ord('-') for a vacant position.
+        The file is read in one go and converted in a single vectorized
+        pass.  The grid is saved in a binary file next to the maze file,
+        <maze>.grid, that is memory-mapped instead of reading the maze
+        file again as long as the maze file does not change.
+        :param
+        mazefile (file object): the file object containing the maze info
+        :return: (NumPy array) the grid
+        """
+        grid = self._load_grid()
+        if grid is not None:
+            return grid
+        data = np.frombuffer(mazefile.read().encode('latin-1', 'replace'),
+                             np.uint8)
+        # the lines start after each newline, a last newline ends the file
+        starts = np.concatenate(([0], np.flatnonzero(data == ord('\n')) + 1))
+        if starts[-1] == len(data):
+            starts = starts[:-1]
+        ends = np.append(starts[1:] - 1, len(data))
+        first_line = data[:ends[0]].tobytes().decode('latin-1')
+        width = len(first_line.strip())  # the first line
+        # chars[y, x] is the char at position (x, y), if the line has one
+        columns = np.arange(width)
+        present = columns < (ends - starts)[:, None]
+        chars = np.where(present,
+                         data[np.minimum(starts[:, None] + columns,
+                                         len(data) - 1)], ord('-'))
+        grid = np.full(chars.shape, ord('-'), np.uint8)
+        for codes, char in ((b'Ww', 'W'), (b'Mm', 'M'), (b'Ss', 'S')):
+            grid[np.isin(chars, list(codes))] = ord(char)
+        self._save_grid(grid)
+        return grid
 
+    def _grid_header(self):
+        """
+        Return the header of the grid file: it identifies the maze
+        file the grid was read from by its size and modification time.
+        This is a private method.
+        :return: (bytes) the header, None if the maze file is unknown
+        """
+        try:
+            status = os.stat(self.maze_name)
+        except (OSError, TypeError):
+            return None
+        return struct.pack('<4sqq', b'SQG1', status.st_size,
+                           status.st_mtime_ns)
+
+    def _load_grid(self):
+        """
+        Memory-map the grid file saved for this maze
+        This is a private method.
+        :return: (NumPy array) the grid or None if there is no valid
+        grid file
+        """
+        header = self._grid_header()
+        if header is None:
+            return None
+        try:
+            with open(self.maze_name + '.grid', 'rb') as cache:
+                saved = cache.read(len(header) + 8)
+            if saved[:len(header)] != header:
+                return None  # the maze file changed
+            height, width = struct.unpack('<II', saved[len(header):])
+            return np.memmap(self.maze_name + '.grid', np.uint8, 'r',
+                             len(header) + 8, (height, width))
+        except (OSError, struct.error, ValueError):
+            return None
+
+    def _save_grid(self, grid):
+        """
+        Save the grid in a binary file next to the maze file
+        This is a private method.
+        :param grid: (NumPy array) the grid
+        :return: None
+        """
+        header = self._grid_header()
+        if header is None:
+            return
+        try:
+            with open(self.maze_name + '.grid', 'wb') as cache:
+                cache.write(header + struct.pack('<II', *grid.shape))
+                cache.write(grid.tobytes())
+        except OSError:
+            pass  # the grid file is only an optimization
 
     def add_mascot(self, position):
         """
@@ -156,6 +730,7 @@ class Problem(object):
         :return: None
         """
         self.mascot_position = position
+        self._unreachable_medals = None  # other medals may be reachable
 
     def add_medal(self, position):
         """
@@ -165,15 +740,265 @@ class Problem(object):
         """
         self.medals.add(position)
 
+    def index_medals(self):
+        """
+        Assign each medal a bit so that the remaining medals in a state
+        can be represented by a single int bitmask.
+        The medals are sorted by position so the encoding is canonical.
+        :return: None
+        """
+        self.medal_list = sorted(self.medals)
+        self.medal_bits = {position: 1 << i
+                           for i, position in enumerate(self.medal_list)}
+
+    def check_reachability(self):
+        """
+        Flood fill the maze from Sammy's position to find the medals
+        that can never be collected, so that the search algorithms can
+        give up at once, and drop the unreachable cells from the maze
+        tables.
+        :return: None
+        """
+        reachable = self.maze.reachable_from(
+            self.maze.index(self.mascot_position))
+        self.maze.restrict(reachable)
+        self.unreachable_medals = {position for position in self.medals
+                                   if not reachable[self.maze.index(position)]}
+
+    def remaining_medals(self, state):
+        """
+        Return the positions of the medals left in the given state
+        :param
+        state - A state is represented by a tuple containing:
+                the current position (x, y) of Sammy the Spartan
+                an int bitmask of the remaining medals
+        :return: list of tuples (x, y) representing medal positions
+        """
+        position, medals_left = state
+        return [self.medal_list[i] for i in range(len(self.medal_list))
+                if medals_left >> i & 1]
+
+    def walls_changed(self):
+        """
+        Drop the distance tables and the unreachable medals computed
+        for the previous walls.
+        The maze neighbor table must be updated separately.
+        :return: None
+        """
+        self._medal_distances = None
+        self._distances_to.clear()
+        self._landmarks = None
+        self._unreachable_medals = None  # a wall may open or cut a path
+
+    @property
+    def unreachable_medals(self):
+        if self._unreachable_medals is None:
+            reachable = self.maze.reachable_from(
+                self.maze.index(self.mascot_position))
+            self._unreachable_medals = {
+                medal for medal in self.medals
+                if not reachable[self.maze.index(medal)]}
+        return self._unreachable_medals
+
+    @unreachable_medals.setter
+    def unreachable_medals(self, medals):
+        self._unreachable_medals = medals
+
+    def medal_distances(self):
+        """
+        Return the table of true maze costs to each medal.
+        It is computed with one Dijkstra search per medal the first
+        time it is needed and reused afterwards.
+        :return: list of lists: the element [i][cell] is the cost of
+        the cheapest path from that cell index to medal_list[i]
+        """
+        if self._medal_distances is None:
+            for position in self.medal_list:
+                if position not in self._distances_to:
+                    self._distances_to[position] = self.maze.distances_to(
+                        self.maze.index(position))
+            self._medal_distances = [self._distances_to[position]
+                                     for position in self.medal_list]
+        return self._medal_distances
+
+    def variant(self, position=None, medals=None):
+        """
+        Return a copy of this quest with Sammy at another position or
+        another set of medals left.  The copy shares the maze, its
+        tables and the distance tables already computed, so it is
+        cheap to make.  The maze tables are not restricted again to the
+        cells Sammy can reach from the new position.  But if the new
+        position was dropped from the tables by check_reachability,
+        the copy gets its own maze tables restricted to the cells
+        reachable from there, and its own medal distance tables.  The
+        landmark tables cover the whole maze and are always shared.
+        :param
+        position: tuple (x, y), Sammy's position, None to keep it
+        medals: iterable of tuples (x, y), the medal positions, None to
+            keep them
+        :return: (Problem) the new quest
+        :raise ValueError: if a position is not an open cell of the maze
+        """
+        for cell in [position] + list(medals or []):
+            if cell is not None and (not self.maze.within_bounds(cell) or
+                                     self.maze.is_wall(cell)):
+                raise ValueError(f'{tuple(cell)} is not an open cell')
+        quest = copy.copy(self)
+        quest._nodes_expanded = 0
+        if position is not None:
+            quest.mascot_position = tuple(position)
+            if not self.maze.in_tables(self.maze.index(position)):
+                # Sammy starts in a part of the maze cut off from the
+                # tables: rebuild them for his new start
+                quest.maze = copy.copy(self.maze)
+                quest.maze.build_neighbors(self.moves, self.cost)
+                quest.maze.restrict(quest.maze.reachable_from(
+                    quest.maze.index(quest.mascot_position)))
+                quest._medal_distances = None
+                quest._distances_to = {}
+        if medals is not None:
+            quest.medals = {tuple(medal) for medal in medals}
+            quest.index_medals()
+            quest._medal_distances = None
+        quest.unreachable_medals = None  # found again when first read
+        return quest
+
+    def landmark_distances(self):
+        """
+        Return the landmark tables used by the ALT heuristic.
+        landmark_count landmarks are picked by farthest-point selection:
+        each one is the cell farthest from the first open cell of the
+        maze and the landmarks already picked.  Moves have directional
+        costs so each landmark has two tables: the cost from the
+        landmark to every cell and from every cell to the landmark.
+        The landmarks depend on the maze alone, not on Sammy's start,
+        so the tables are shared by the variants of the quest.  They
+        are computed the first time they are needed and cached on disk
+        next to the maze file (maze_name + '.landmarks') so that later
+        runs on the same maze skip the computation.
+        :return: (tuple) two lists of arrays, forward and backward:
+        forward[i][cell] is the cost from landmark i to the cell,
+        backward[i][cell] the cost from the cell to landmark i.
+        -1 stands for cells that cannot be reached.
+        """
+        if self._landmarks is None:
+            self._landmarks = self._load_landmarks()
+        if self._landmarks is None:
+            self._landmarks = self._build_landmarks()
+            self._save_landmarks()
+        return self._landmarks
+
+    def _build_landmarks(self):
+        """
+        Pick the landmarks and compute their distance tables over the
+        whole maze, even if the tables of this quest are restricted to
+        the cells Sammy can reach.
+        This is a private method.
+        :return: (tuple) the forward and backward tables
+        """
+        maze = self.maze.unrestricted()
+        integer_costs = all(type(self.cost[action]) is int
+                            for action in self.moves)
+        forward = []
+        backward = []
+        open_cells = np.flatnonzero(~maze.walls)
+        if not len(open_cells):
+            return forward, backward
+        seed = int(open_cells[0])
+        # cost from the landmarks picked so far, in either direction
+        separation = [a + b for a, b in zip(maze.distances_from(seed),
+                                            maze.distances_to(seed))]
+        for _ in range(self.landmark_count):
+            candidates = [cell for cell, cost in enumerate(separation)
+                          if 0 < cost < math.inf]
+            if not candidates:
+                break
+            landmark = max(candidates, key=separation.__getitem__)
+            tables = (maze.distances_from(landmark),
+                      maze.distances_to(landmark))
+            for table, distances in zip((forward, backward), tables):
+                table.append(array('q' if integer_costs else 'd',
+                                   (-1 if cost == math.inf else cost
+                                    for cost in distances)))
+            separation = [min(cost, a + b) for cost, a, b in
+                          zip(separation, *tables)]
+        return forward, backward
+
+    def _landmark_key(self):
+        """
+        Identify the maze layout, move costs and landmark count the
+        landmark tables were computed for.
+        This is a private method.
+        :return: (string) a hex digest
+        """
+        digest = hashlib.sha1()
+        digest.update(repr((self.maze.width, self.maze.height,
+                            self.landmark_count,
+                            sorted((action, self.cost[action])
+                                   for action in self.moves))).encode())
+        digest.update(self.maze.walls.tobytes())
+        return digest.hexdigest()
+
+    def quest_key(self):
+        """
+        Identify the quest: the maze layout, the medals, Sammy's start
+        and the move costs.  Only the single step moves are hashed:
+        the other entries of cost are derived from them (macro-actions
+        and cluster paths) and may not be comparable.
+        :return: (string) a hex digest
+        """
+        digest = hashlib.sha1()
+        digest.update(repr((self.maze.width, self.maze.height,
+                            self.mascot_position, sorted(self.medals),
+                            sorted((action, self.cost[action])
+                                   for action in self.moves))).encode())
+        digest.update(self.maze.walls.tobytes())
+        return digest.hexdigest()
+
+    def _load_landmarks(self):
+        """
+        Read the landmark tables cached on disk for this maze
+        This is a private method.
+        :return: (tuple) the forward and backward tables or None if
+        there is no valid cache
+        """
+        if self.maze_name is None:
+            return None
+        try:
+            with open(self.maze_name + '.landmarks', 'rb') as cache:
+                key, tables = pickle.load(cache)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        return tables if key == self._landmark_key() else None
+
+    def _save_landmarks(self):
+        """
+        Cache the landmark tables on disk next to the maze file.
+        The tables are written to a file of this process and renamed,
+        so a process reading the cache never sees a partial file.
+        This is a private method.
+        :return: None
+        """
+        if self.maze_name is None:
+            return
+        file_name = self.maze_name + '.landmarks'
+        partial_name = f'{file_name}.{os.getpid()}'
+        try:
+            with open(partial_name, 'wb') as cache:
+                pickle.dump((self._landmark_key(), self._landmarks), cache)
+            os.replace(partial_name, file_name)
+        except OSError:
+            pass  # the cache is only an optimization
+
     def is_goal(self, state):
         """
         Is the state specified a goal state?
         The state is a goal state when there are no medals left to
         collect.
         :param
-        state - A state is represented by a tuple containing two tuples:
+        state - A state is represented by a tuple containing:
                 the current position (x, y) of Sammy the Spartan
-                a tuple containing the positions of the remaining medals
+                an int bitmask of the remaining medals
 
         :return: Boolean - True if this is a goal state, False otherwise
         """
@@ -185,26 +1010,27 @@ class Problem(object):
         Return the start state in this quest
         The start state is identified by the mascot's position and the
         initial distribution of the medals in the maze.
-        It is represented by a tuple containing two other tuples:
+        It is represented by a tuple containing:
                 the current position (x, y) of Sammy the Spartan
-                a tuple containing the positions of the medals
+                an int bitmask of the medals, bit i is set when
+                medal_list[i] is still in the maze
 
         :return:
         state - The start state in the quest
-                A state is represented by a tuple containing two tuples:
-                the current position (row, column) of Sammy the Spartan
-                a tuple containing the positions of the remaining medals
+                A state is represented by a tuple containing:
+                the current position (x, y) of Sammy the Spartan
+                an int bitmask of the remaining medals
         """
-        return self.mascot_position, tuple(self.medals)
+        return self.mascot_position, (1 << len(self.medal_list)) - 1
 
     def expand(self, state):
         """
         Return a list of tuples representing all states reachable
         from the current state with their corresponding action and costs
         :param
-        state - A state is represented by a tuple containing two other tuples:
+        state - A state is represented by a tuple containing:
                 the current position (x, y) of Sammy the Spartan
-                a tuple containing the positions of the remaining medals
+                an int bitmask of the remaining medals
         :return:
         a list of tuples representing all states that are reachable
         from the current state with their corresponding action and cost
@@ -212,16 +1038,16 @@ class Problem(object):
         result = []
         self._nodes_expanded += 1 # update private variable
         position, current_medals = state
-        current_x, current_y = position
-        for action in self.moves:
-            new_position = (current_x + self.moves[action][0],
-                            current_y + self.moves[action][1])
-            # if the move in that direction is valid
-            if self.maze.within_bounds(new_position) and \
-                not self.maze.is_wall(new_position):
-                new_medals = set(current_medals) - {new_position}
-                new_state = (new_position, tuple(new_medals))
-                result.append((new_state, action, self.cost[action]))
+        positions = self.maze.positions
+        # the neighbor table only lists valid moves
+        for target, action, action_cost in \
+                self.maze.neighbors[self.maze.index(position)]:
+            new_position = positions[target]
+            # clear the bit of the medal collected, if any
+            new_medals = current_medals & ~self.medal_bits.get(
+                new_position, 0)
+            new_state = (new_position, new_medals)
+            result.append((new_state, action, action_cost))
         return result
 
 
@@ -237,43 +1063,719 @@ class Problem(object):
     def nodes_expanded(self):
         return self._nodes_expanded
 
+    def count_expanded(self, count):
+        """
+        Record nodes expanded without calling expand, for search
+        algorithms that expand many states at once
+        :param count: (int) the number of nodes expanded
+        :return: None
+        """
+        self._nodes_expanded += int(count)
+
+    def unpack(self, actions):
+        """
+        Turn the actions of a solution into the single moves that
+        graphics.Display expects.  They already are single moves here,
+        subclasses searching coarser graphs override this method.
+        :param actions (list): the actions of a solution
+        :return: list of single moves
+        """
+        return list(actions)
+
+
+class CorridorProblem(Problem):
+    """
+    Represent the quest on a compressed maze graph where each corridor
+    (a run of cells with exactly two open neighbors and no medal) is
+    contracted into a single weighted macro-edge.
+    Sammy's starting cell, medal cells, junctions and dead ends remain
+    real nodes.  A macro-action is the string of moves along its
+    corridor, e.g. 'EEN', and costs the sum of those moves.
+    The search algorithms that work through expand run unchanged on
+    this smaller graph, unpack turns their solution back into the
+    single moves that graphics.Display expects.
+
+    Arguments:
+    mazefile (file): text file containing the maze info
+
+    Attributes:
+    All the attributes of Problem and:
+    cost (dictionary): the cost of each single move and macro-action
+    macro_edges (dictionary): maps the position of each real node to a
+    list of (target position, macro-action, cost) tuples
+    """
+
+    def __init__(self, mazefile):
+        super().__init__(mazefile)
+        self.cost = dict(Problem.cost)  # macro-actions are added here
+        self.build_corridors()
+
+    def build_corridors(self):
+        """
+        Walk every corridor out of every real node and record the
+        resulting macro-edges.
+        :return: None
+        """
+        maze = self.maze
+        nodes = {maze.index(self.mascot_position)}
+        nodes.update(maze.index(position) for position in self.medals)
+        degrees = np.diff(maze.neighbors.arrays()[0])
+        nodes.update(np.flatnonzero((degrees > 0) & (degrees != 2)).tolist())
+        self.macro_edges = {}
+        for cell in nodes:
+            edges = []
+            for target, action, action_cost in maze.neighbors[cell]:
+                previous, current = cell, target
+                macro, total = action, action_cost
+                while current not in nodes:  # follow the corridor
+                    for other, step, step_cost in maze.neighbors[current]:
+                        if other != previous:
+                            break
+                    previous, current = current, other
+                    macro += step
+                    total += step_cost
+                if current != cell:  # ignore corridors looping back
+                    edges.append((maze.positions[current], macro, total))
+                    self.cost[macro] = total
+            self.macro_edges[maze.positions[cell]] = edges
+
+    def expand(self, state):
+        """
+        Return a list of tuples representing all states reachable
+        from the current state with one macro-action, with their
+        corresponding macro-action and cost
+        :param
+        state - A state is represented by a tuple containing:
+                the current position (x, y) of Sammy the Spartan
+                an int bitmask of the remaining medals
+        :return:
+        a list of tuples representing all states that are reachable
+        from the current state with their corresponding action and cost
+        """
+        self._nodes_expanded += 1 # update private variable
+        position, current_medals = state
+        return [((target, current_medals & ~self.medal_bits.get(target, 0)),
+                 macro, macro_cost)
+                for target, macro, macro_cost in self.macro_edges[position]]
+
+    def unpack(self, actions):
+        """
+        Expand macro-actions back into single moves
+        :param actions (list): macro-actions (or single moves)
+        :return: list of single moves
+        """
+        return [move for macro in actions for move in macro]
+
+
+class HierarchicalProblem(Problem):
+    """
+    Represent the quest on an abstract graph for hierarchical
+    pathfinding (HPA*).
+    The maze is split into square clusters.  Where two clusters share
+    a run of open border cells, one transition (the middle of a short
+    run) or two (the ends of a long run) become abstract nodes linked
+    by the single move across the border.  Sammy's starting cell and
+    the medal cells are abstract nodes as well.  Within each cluster,
+    the cheapest path between every two abstract nodes is found once
+    with a search restricted to the cluster and becomes an abstract
+    edge labeled by the (source, target) cell pair, whose cost is added
+    to the cost table.  Only the edges of the solution are refined into
+    single moves, by unpack.
+    Solutions are near optimal: paths are restricted to the transition
+    cells.
+
+    Arguments:
+    mazefile (file): text file containing the maze info
+    cluster_size (int): the width and height of a cluster
+
+    Attributes:
+    All the attributes of Problem and:
+    cluster_size (int): the width and height of a cluster
+    cost (dictionary): the cost of each single move and abstract edge
+    abstract_edges (dictionary): maps the position of each abstract
+    node to a list of (target position, action, cost, medal bits)
+    tuples.  medal bits has the bits of the medals collected on the way.
+    """
+    long_entrance = 6  # runs at least this long get two transitions
+
+    def __init__(self, mazefile, cluster_size=10):
+        super().__init__(mazefile)
+        self.cluster_size = cluster_size
+        self.cost = dict(Problem.cost)  # abstract edges are added here
+        self._refined = {}  # (source, target) -> list of moves
+        columns = -(-self.maze.width // cluster_size)  # rounded up
+        self._clusters = [y // cluster_size * columns + x // cluster_size
+                          for x, y in self.maze.positions]
+        self.build_abstract_graph()
+
+    def cluster(self, cell):
+        """
+        Return the cluster containing the given cell
+        :param cell: (int) a cell index
+        :return: (int) the index of the cluster
+        """
+        return self._clusters[cell]
+
+    def build_abstract_graph(self):
+        """
+        Find the transitions between clusters and the cheapest paths
+        between the abstract nodes of each cluster.
+        :return: None
+        """
+        maze = self.maze
+        size = self.cluster_size
+        nodes = {maze.index(self.mascot_position)}
+        nodes.update(maze.index(position) for position in self.medals)
+        edges = collections.defaultdict(list)
+        # transitions across vertical borders, then horizontal borders
+        borders = [((x, y), (x + 1, y)) for x in range(size - 1,
+                                                       maze.width - 1, size)
+                   for y in range(maze.height)]
+        borders += [((x, y), (x, y + 1)) for y in range(size - 1,
+                                                        maze.height - 1, size)
+                    for x in range(maze.width)]
+        run = []
+        for pair in borders + [None]:
+            if pair is not None and self._open_pair(*pair) and \
+                    (not run or self._same_border(run[-1], pair)):
+                run.append(pair)
+                continue
+            if run:  # the run ended: add its transitions
+                if len(run) < self.long_entrance:
+                    chosen = [run[len(run) // 2]]
+                else:
+                    chosen = [run[0], run[-1]]
+                for first, second in chosen:
+                    a, b = maze.index(first), maze.index(second)
+                    nodes.update((a, b))
+                    for source, target in ((a, b), (b, a)):
+                        for other, action, action_cost in \
+                                maze.neighbors[source]:
+                            if other == target:
+                                edges[source].append(
+                                    (maze.positions[target], action,
+                                     action_cost, 0))
+            run = [pair] if pair is not None and \
+                self._open_pair(*pair) else []
+        # cheapest paths between the abstract nodes of each cluster
+        by_cluster = collections.defaultdict(list)
+        for cell in nodes:
+            by_cluster[self.cluster(cell)].append(cell)
+        for cells in by_cluster.values():
+            for source in cells:
+                distances, parents = self._cluster_search(source)
+                for target in cells:
+                    if target == source or target not in distances:
+                        continue
+                    bits = 0  # medals collected along the way
+                    cell = parents[target]
+                    while cell != source:
+                        bits |= self.medal_bits.get(maze.positions[cell], 0)
+                        cell = parents[cell]
+                    self.cost[(source, target)] = distances[target]
+                    edges[source].append((maze.positions[target],
+                                          (source, target),
+                                          distances[target], bits))
+        self.abstract_edges = {maze.positions[cell]: edges[cell]
+                               for cell in nodes}
+
+    def _open_pair(self, first, second):
+        """
+        Are both cells of a border pair open and reachable?
+        This is a private method.
+        :param first, second: tuples (x, y) on either side of a border
+        :return: Boolean
+        """
+        maze = self.maze
+        return bool(maze.neighbors[maze.index(first)] and
+                    maze.neighbors[maze.index(second)])
+
+    def _same_border(self, pair, other):
+        """
+        Do two border pairs belong to the same run of adjacent pairs
+        along the same stretch of border between two clusters?
+        This is a private method.
+        :param pair, other: border pairs, other follows pair
+        :return: Boolean
+        """
+        (x1, y1), (x2, y2) = pair
+        (x3, y3), (x4, y4) = other
+        if x1 == x3 and x2 == x4:  # vertical border
+            return y3 == y1 + 1 and y3 % self.cluster_size != 0
+        if y1 == y3 and y2 == y4:  # horizontal border
+            return x3 == x1 + 1 and x3 % self.cluster_size != 0
+        return False
+
+    def _cluster_search(self, source):
+        """
+        Dijkstra's algorithm restricted to the cluster of the source
+        This is a private method.
+        :param source: (int) the index of the source cell
+        :return: (tuple of dictionaries) the cost to each cell reached
+        and the parent cell and action that reached it
+        """
+        clusters = self._clusters
+        cluster = clusters[source]
+        distances = {source: 0}
+        parents = {source: None}
+        fringe = [(0, source)]
+        while fringe:
+            distance, cell = heapq.heappop(fringe)
+            if distance > distances[cell]:
+                continue  # stale entry
+            for other, action, step_cost in self.maze.neighbors[cell]:
+                if clusters[other] == cluster and \
+                        distance + step_cost < distances.get(other,
+                                                             math.inf):
+                    distances[other] = distance + step_cost
+                    parents[other] = cell
+                    heapq.heappush(fringe, (distances[other], other))
+        return distances, parents
+
+    def expand(self, state):
+        """
+        Return a list of tuples representing all states reachable
+        from the current state along one abstract edge, with their
+        corresponding action and cost
+        :param
+        state - A state is represented by a tuple containing:
+                the current position (x, y) of Sammy the Spartan
+                an int bitmask of the remaining medals
+        :return:
+        a list of tuples representing all states that are reachable
+        from the current state with their corresponding action and cost
+        """
+        self._nodes_expanded += 1 # update private variable
+        position, current_medals = state
+        return [((target, current_medals & ~bits
+                  & ~self.medal_bits.get(target, 0)), action, action_cost)
+                for target, action, action_cost, bits
+                in self.abstract_edges[position]]
+
+    def unpack(self, actions):
+        """
+        Refine the abstract edges of a solution into single moves
+        :param actions (list): single moves and (source, target) edges
+        :return: list of single moves
+        """
+        moves = []
+        for action in actions:
+            if action in self.moves:
+                moves.append(action)
+                continue
+            if action not in self._refined:
+                source, target = action
+                path = []
+                distances, parents = self._cluster_search(source)
+                cell = target
+                while cell != source:
+                    previous = parents[cell]
+                    path.append(next(move for other, move, move_cost
+                                     in self.maze.neighbors[previous]
+                                     if other == cell))
+                    cell = previous
+                path.reverse()
+                self._refined[action] = path
+            moves.extend(self._refined[action])
+        return moves
+
+
+# search algorithms returning optimal solutions (with an admissible
+# heuristic) and the default portfolio
+OPTIMAL_SEARCHES = {'astar', 'ida_star', 'frontier_astar', 'ucs',
+                    'bidirectional_ucs', 'external_ucs', 'held_karp'}
+PORTFOLIO = ['astar:gen_heuristic', 'astar:mst_heuristic',
+             'astar:alt_heuristic', 'ucs']
+
+
+def run_configuration(quest, configuration, results):
+    """
+    Solve the quest with one portfolio configuration and put the
+    outcome in the results queue.  Runs in its own process.
+    :param
+    quest (a Problem object): the quest to solve
+    configuration (string): search algorithm and optional heuristic
+        separated by a colon, e.g. astar:gen_heuristic
+    results (multiprocessing.Queue): receives a tuple (configuration,
+        solution, nodes expanded, processing time).  The solution is
+        None if there is none and the exception if the search failed.
+    :return: None
+    """
+    search, _, heuristic = configuration.partition(':')
+    start_time = time.time()
+    try:
+        if hasattr(informed_search, search):
+            solution = getattr(informed_search, search)(
+                quest, getattr(informed_search, heuristic or
+                               'null_heuristic'))
+        else:
+            solution = getattr(uninformed_search, search)(quest)
+    except Exception as error:  # report it instead of losing the race
+        solution = error
+    results.put((configuration, solution, quest.nodes_expanded(),
+                 time.time() - start_time))
+
+
+def race(quest, configurations, time_limit=None):
+    """
+    Run several (search algorithm, heuristic) configurations at once on
+    the same quest, each in its own process.  The first solution from
+    an optimal search algorithm wins and the other processes are
+    cancelled.  Otherwise the cheapest solution found by the deadline,
+    or once every configuration finished, wins.
+    :param
+    quest (a Problem object): the quest to solve
+    configurations (list of strings): e.g. ['astar:gen_heuristic', 'ucs']
+    time_limit (number): deadline in seconds, None for no deadline
+    :return: (tuple) the winning configuration, its solution, the number
+    of nodes it expanded and its processing time, or None if no
+    configuration found a solution
+    """
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_configuration,
+                                         args=(quest, configuration, results),
+                                         daemon=True)
+                 for configuration in configurations]
+    for process in processes:
+        process.start()
+    deadline = None if time_limit is None else time.time() + time_limit
+    best = None
+    try:
+        for _ in configurations:
+            timeout = None if deadline is None else \
+                max(0, deadline - time.time())
+            try:
+                outcome = results.get(timeout=timeout)
+            except queue.Empty:
+                break  # deadline reached
+            configuration, solution, expanded, elapsed = outcome
+            if isinstance(solution, Exception):
+                print(f'{configuration} failed: {solution!r}')
+                continue
+            if solution is None:
+                continue
+            cost = quest.path_cost(solution)
+            if best is None or cost < quest.path_cost(best[1]):
+                best = outcome
+            if configuration.partition(':')[0] in OPTIMAL_SEARCHES:
+                break  # optimal: no other configuration can do better
+    finally:
+        for process in processes:  # cancel the configurations left
+            process.terminate()
+            process.join()
+    return best
+
+
+def log_winner(log_name, maze_name, outcome, cost):
+    """
+    Append the winning portfolio configuration for a maze to the log
+    :param
+    log_name (string): name of the log file
+    maze_name (string): name of the maze file
+    outcome (tuple): as returned by race
+    cost (number): the cost of the winning solution
+    :return: None
+    """
+    configuration, solution, expanded, elapsed = outcome
+    with open(log_name, 'a') as log:
+        log.write(f'{time.strftime("%Y-%m-%d %H:%M:%S")}\t{maze_name}\t'
+                  f'{configuration}\t{cost}\t{expanded}\t{elapsed:.4f}\n')
+
+
+# The options each search algorithm reads that can change its solution.
+# A cached solution is reused whatever the other options are.
+SEARCH_OPTIONS = {
+    'astar': ['heuristic', 'dominance', 'corridors'],
+    'ida_star': ['heuristic', 'table_size', 'corridors'],
+    'ara_star': ['heuristic', 'weight', 'time_limit', 'node_limit',
+                 'corridors'],
+    'hpa_star': ['heuristic', 'cluster_size'],
+    'parallel_astar': ['heuristic', 'workers', 'corridors'],
+    'frontier_astar': ['heuristic'],
+    'portfolio': ['configurations', 'time_limit', 'corridors'],
+    'ucs': ['dominance', 'corridors'],
+    'external_ucs': ['memory_limit', 'corridors']}
+
+
+class SolutionCache(object):
+    """
+    Persistent cache of the solutions found, kept in a pickle file.
+    Entries are keyed by the quest (see Problem.quest_key) and the
+    search configuration.  The least recently used entries are evicted
+    when there are more than max_entries.
+
+    Arguments:
+    file_name (string): the cache file, created if needed
+    max_entries (int): the maximum number of solutions kept
+
+    Attributes:
+    file_name (string): the cache file
+    max_entries (int): the maximum number of solutions kept
+    entries (collections.OrderedDict): maps each key to a tuple
+        (solution, cost, nodes expanded, processing time), the least
+        recently used first
+    """
+
+    def __init__(self, file_name, max_entries=1000):
+        self.file_name = file_name
+        self.max_entries = max_entries
+        try:
+            with open(file_name, 'rb') as cache:
+                self.entries = pickle.load(cache)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            self.entries = collections.OrderedDict()
+
+    @staticmethod
+    def key(quest, configuration):
+        """
+        Return the cache key of a quest solved with a configuration
+        :param
+        quest (a Problem object): the quest
+        configuration (dictionary): the options the solution depends on
+        :return: (string) the key
+        """
+        return quest.quest_key() + repr(sorted(configuration.items()))
+
+    def get(self, quest, configuration):
+        """
+        Return the cached solution, after checking that its actions
+        exist and add up to the cost recorded
+        :param
+        quest (a Problem object): the quest
+        configuration (dictionary): the options the solution depends on
+        :return: (tuple) solution, cost, nodes expanded and processing
+        time, or None if there is no valid entry
+        """
+        key = self.key(quest, configuration)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        solution, cost = entry[:2]
+        if not all(action in quest.cost for action in solution) or \
+                quest.path_cost(solution) != cost:
+            del self.entries[key]  # stale or corrupted
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, quest, configuration, solution, expanded, elapsed):
+        """
+        Cache a solution and evict the least recently used entries
+        :param
+        quest (a Problem object): the quest
+        configuration (dictionary): the options the solution depends on
+        solution (list): the actions of the solution
+        expanded (int): the number of nodes expanded to find it
+        elapsed (number): the processing time in seconds
+        :return: None
+        """
+        key = self.key(quest, configuration)
+        self.entries[key] = (solution, quest.path_cost(solution),
+                             expanded, elapsed)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        """
+        Write the cache file
+        :return: None
+        """
+        try:
+            with open(self.file_name, 'wb') as cache:
+                pickle.dump(self.entries, cache)
+        except OSError:
+            pass  # the cache is only an optimization
+
 
 def get_arguments():
     '''
     Parse and validate the command line arguments
-    :return: (tuple containing a file object and a string)
-            the maze file specified  and the search algoeithm specified
+    :return: (argparse.Namespace) the arguments specified: the maze
+            file object, the search algorithm, the heuristic and the
+            options
     '''
     parser = argparse.ArgumentParser()
     parser.add_argument('maze_file',
                         help='name of the text file containing the maze info',
                         type=argparse.FileType('r')) # open the file
     parser.add_argument('search_algorithm',
-                        help='astar, dfs, bfs or ucs?',
-                        choices=['astar','dfs', 'bfs', 'ucs'])
+                        help='astar, ida_star, ara_star, hpa_star, '
+                             'parallel_astar, frontier_astar, portfolio, '
+                             'dfs, bfs, layered_bfs, ucs, bidirectional_ucs, '
+                             'external_ucs or held_karp?',
+                        choices=['astar', 'ida_star', 'ara_star', 'hpa_star',
+                                 'parallel_astar', 'frontier_astar',
+                                 'portfolio', 'dfs', 'bfs', 'layered_bfs',
+                                 'ucs', 'bidirectional_ucs', 'external_ucs',
+                                 'held_karp'])
     parser.add_argument('heuristic',
                         help='A* heuristic',
                         nargs='?',
                         default='null_heuristic')
+    parser.add_argument('--cache-size',
+                        help='cache up to this many heuristic values',
+                        type=int,
+                        default=0)
+    parser.add_argument('--table-size',
+                        help='ida_star transposition table size, '
+                             '0 for none',
+                        type=int,
+                        default=10000)
+    parser.add_argument('--weight',
+                        help='ara_star initial heuristic weight',
+                        type=float,
+                        default=3.0)
+    parser.add_argument('--time-limit',
+                        help='ara_star time budget in seconds',
+                        type=float)
+    parser.add_argument('--node-limit',
+                        help='ara_star budget in nodes expanded',
+                        type=int)
+    parser.add_argument('--corridors',
+                        help='contract corridors into macro-edges',
+                        action='store_true')
+    parser.add_argument('--cluster-size',
+                        help='hpa_star cluster width and height',
+                        type=int,
+                        default=10)
+    parser.add_argument('--workers',
+                        help='number of parallel_astar worker processes',
+                        type=int,
+                        default=multiprocessing.cpu_count())
+    parser.add_argument('--solution-cache',
+                        help='file caching the solutions found',
+                        nargs='?',
+                        const='spartanquest.solutions')
+    parser.add_argument('--cache-entries',
+                        help='number of solutions kept in the cache',
+                        type=int,
+                        default=1000)
+    parser.add_argument('--memory-limit',
+                        help='external_ucs memory limit in megabytes',
+                        type=float,
+                        default=64)
+    parser.add_argument('--dominance',
+                        help='ucs and astar dominance pruning',
+                        action='store_true')
+    parser.add_argument('--configurations',
+                        help='portfolio search algorithm:heuristic pairs',
+                        default=','.join(PORTFOLIO))
+    parser.add_argument('--portfolio-log',
+                        help='file the portfolio winners are appended to',
+                        default='portfolio.log')
     arguments = parser.parse_args()
+    searches = [arguments.search_algorithm]
+    if arguments.search_algorithm == 'portfolio':
+        searches = [configuration.partition(':')[0] for configuration
+                    in arguments.configurations.split(',')]
+    if arguments.corridors and 'frontier_astar' in searches:
+        # its used moves bitmasks only know the single step moves
+        parser.error('frontier_astar cannot search the corridor macro-edges'
+                     ' (--corridors)')
+    return arguments
+
+
+def report_solution(solution, cost, bound):
+    """
+    Print an intermediate solution found by an anytime search
+    :param
+    solution (list): the actions of the solution
+    cost (number): the cost of the solution
+    bound (number): its cost is at most bound times the optimal cost
+    :return: None
+    """
+    print(f'Solution found: length {len(solution)}, cost {cost}, '
+          f'at most {bound:.3f} times the optimal cost')
+
+
+def report_workers(expanded):
+    """
+    Print the number of nodes expanded by each parallel worker
+    :param expanded (list of ints): the count for each worker
+    :return: None
+    """
+    for index, count in enumerate(expanded):
+        print(f'Worker {index} expanded {count:,} nodes')
 
-    maze_file = arguments.maze_file
-    search = arguments.search_algorithm
-    heuristic = arguments.heuristic
-    return maze_file, search, heuristic
 
 def main():
-    maze_file, search, heuristic = get_arguments()
-    quest = Problem(maze_file)  # Initialize our search problem for this quest
+    arguments = get_arguments()
+    search = arguments.search_algorithm
+    informed = search in {"astar", "ida_star", "ara_star", "hpa_star",
+                          "parallel_astar", "frontier_astar"}
+    # Initialize our search problem for this quest
+    if search == "hpa_star":
+        quest = HierarchicalProblem(arguments.maze_file,
+                                    arguments.cluster_size)
+    elif arguments.corridors:
+        quest = CorridorProblem(arguments.maze_file)
+    else:
+        quest = Problem(arguments.maze_file)
     start_time = time.time()
-    if search == "astar":
-        heuristic_function = getattr(informed_search, heuristic)
-        search_function = getattr(informed_search, search)
-        solution = search_function(quest, heuristic_function)
+    cache = cached = None
+    if arguments.solution_cache:
+        cache = SolutionCache(arguments.solution_cache,
+                              arguments.cache_entries)
+        configuration = {name: getattr(arguments, name)
+                         for name in ['search_algorithm'] +
+                         SEARCH_OPTIONS.get(search, ['corridors'])}
+        cached = cache.get(quest, configuration)
+    if cached is not None:
+        solution, cost, expanded, search_time = cached
+        quest.count_expanded(expanded)
+        print(f'Solution read from the cache '
+              f'(it took {search_time:.4f}(sec) to find)')
+    elif informed:
+        heuristic_function = getattr(informed_search, arguments.heuristic)
+        if arguments.cache_size > 0:
+            heuristic_function = informed_search.CachedHeuristic(
+                heuristic_function, arguments.cache_size)
+        if search == "ida_star":
+            solution = informed_search.ida_star(quest, heuristic_function,
+                                                arguments.table_size)
+        elif search == "ara_star":
+            solution = informed_search.ara_star(
+                quest, heuristic_function, arguments.weight,
+                time_limit=arguments.time_limit,
+                node_limit=arguments.node_limit,
+                report=report_solution)
+        elif search == "frontier_astar":
+            solution = informed_search.frontier_astar(quest,
+                                                      heuristic_function)
+        elif search == "parallel_astar":
+            solution = informed_search.parallel_astar(
+                quest, heuristic_function, arguments.workers,
+                report=report_workers)
+        else:
+            solution = informed_search.astar(quest, heuristic_function,
+                                             arguments.dominance)
+    elif search == "portfolio":
+        outcome = race(quest, arguments.configurations.split(','),
+                       arguments.time_limit)
+        solution = None
+        if outcome is not None:
+            configuration, solution, expanded, elapsed = outcome
+            quest.count_expanded(expanded)
+            print(f'Winning configuration: {configuration}')
+            log_winner(arguments.portfolio_log, quest.maze_name, outcome,
+                       quest.path_cost(solution))
+    elif search == "ucs":
+        solution = uninformed_search.ucs(quest, arguments.dominance)
+    elif search == "external_ucs":
+        solution = uninformed_search.external_ucs(quest,
+                                                  arguments.memory_limit)
     else:
         search_function = getattr(uninformed_search, search)
         solution = search_function(quest)  # Invoke the search algorithm
+    if solution is not None and cached is None:
+        solution = quest.unpack(solution)  # back to single moves
     elapsed_time = time.time() - start_time
+    if cache is not None:
+        if solution is not None and cached is None:
+            cache.put(quest, configuration, solution,
+                      quest.nodes_expanded(), elapsed_time)
+        cache.save()
 
     # Print some statistics
     if solution is not None:
@@ -283,6 +1785,11 @@ def main():
         print('The quest failed!')
     print(f'Number of nodes expanded: {quest.nodes_expanded():,}')
     print(f'Processing time: {elapsed_time:.4f}(sec)')
+    # parallel_astar workers count their hits in their own cache copies
+    if informed and arguments.cache_size > 0 and cached is None and \
+            search != "parallel_astar":
+        print(f'Heuristic cache hits: {heuristic_function.hits:,}'
+              f' misses: {heuristic_function.misses:,}')
 
     graphics.Display(quest, solution)  # Visualize the solution
 
@@ -10,7 +10,17 @@ Uninformed Search Algorithm implementation
 
 dfs has been implemented for you.
 Your task for homework 3 is to implement bfs and ucs.
+
+layered_bfs is a breadth first search that expands a whole layer of
+states at a time with NumPy.
+bidirectional_ucs searches from both ends of single medal quests.
+external_ucs keeps its fringe and closed set on disk.
+held_karp solves the medal collection order exactly with dynamic
+programming over the maze distances between medals.
 """
+import math
+import tempfile
+import numpy as np
 import data_structures
 
 def dfs(problem):
@@ -21,19 +31,23 @@ def dfs(problem):
     :return: list of actions representing the solution to the quest
                 or None if there is no solution
     """
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
     closed = set()  # keep track of our explored states
     fringe = data_structures.Stack() # for dfs, the fringe is a stack
+    nodes = data_structures.NodeArena(problem.cost)  # node ids are ints
     state = problem.start_state()
-    root = data_structures.Node(state, None, None)
+    root = nodes.add(state, -1, None)
     fringe.push(root)
     while not fringe.is_empty():
         node = fringe.pop()
-        if problem.is_goal(node.state):
-            return node.solution()  # we found a solution
-        if node.state not in closed:  # we are implementing graph search
-            closed.add(node.state)
-            for child_state, action, action_cost in problem.expand(node.state):
-                child_node = data_structures.Node(child_state, node, action)
+        state = nodes.states[node]
+        if problem.is_goal(state):
+            return nodes.solution(node)  # we found a solution
+        if state not in closed:  # we are implementing graph search
+            closed.add(state)
+            for child_state, action, action_cost in problem.expand(state):
+                child_node = nodes.add(child_state, node, action)
                 fringe.push(child_node)
     return None  # Failure -  no solution was found
 
@@ -45,16 +59,421 @@ def bfs(problem):
     :return: list of actions representing the solution to the quest
             or None if there is no solution
     """
-    # Enter your  code here and remove the pass statement below
-    pass
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
+    closed = set()  # keep track of our explored states
+    fringe = data_structures.Queue()  # for bfs, the fringe is a queue
+    nodes = data_structures.NodeArena(problem.cost)  # node ids are ints
+    state = problem.start_state()
+    root = nodes.add(state, -1, None)
+    fringe.push(root)
+    while not fringe.is_empty():
+        node = fringe.pop()
+        state = nodes.states[node]
+        if problem.is_goal(state):
+            return nodes.solution(node)  # we found a solution
+        if state not in closed:  # we are implementing graph search
+            closed.add(state)
+            for child_state, action, action_cost in problem.expand(state):
+                child_node = nodes.add(child_state, node, action)
+                fringe.push(child_node)
+    return None  # Failure -  no solution was found
 
-def ucs(problem):
+def _move_tables(problem):
+    """
+    Build the NumPy tables used to expand many packed states at once
+    This is a private function.
+    :param
+    problem (a Problem object) representing the quest
+    :return: (tuple) the list of actions, the targets table:
+    targets[cell, code] is the cell reached by actions[code] or -1,
+    and the cell_bits table: cell_bits[cell] is the bit of the medal in
+    that cell, if any
+    """
+    maze = problem.maze
+    actions = list(problem.moves)
+    targets = np.full((len(maze.positions), len(actions)), -1, np.int64)
+    offsets, move_targets, codes, costs = maze.neighbors.arrays()
+    codes = np.array([actions.index(action)
+                      for action in maze.neighbors.actions])[codes]
+    targets[maze.neighbors.sources(), codes] = move_targets
+    cell_bits = np.zeros(len(maze.positions), np.int64)
+    for position, bit in problem.medal_bits.items():
+        cell_bits[maze.index(position)] = bit
+    return actions, targets, cell_bits
+
+def layered_bfs(problem):
+    """
+    Breadth first graph search algorithm, one layer at a time
+    A state is packed into a single int: its cell index shifted left
+    by the number of medals, ORed with its medal bitmask.
+    Each layer is a NumPy array of packed states that is expanded at
+    once with vectorized neighbor lookups and deduplicated against a
+    visited bitmap, one bit per state packed in bytes (or a sorted
+    array of visited states when the bitmap would take more than
+    32 MiB).
+    :param problem (a Problem object) representing the quest
+            see Problem class definition in spartanquest.py)
+    :return: list of actions representing the solution to the quest
+            or None if there is no solution
+    """
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
+    maze = problem.maze
+    actions, targets, cell_bits = _move_tables(problem)
+    shift = len(problem.medal_list)
+    all_medals = (1 << shift) - 1
+
+    state = problem.start_state()
+    if problem.is_goal(state):
+        return []
+    position, medals = state
+    layer = np.array([maze.index(position) << shift | medals], np.int64)
+    state_count = len(maze.positions) << shift
+    if state_count <= 1 << 28:
+        # bit (state & 7) of byte (state >> 3) is set once visited
+        visited = np.zeros((state_count + 7) >> 3, np.uint8)
+        visited[layer >> 3] |= np.uint8(1) << (layer & 7).astype(np.uint8)
+    else:
+        visited = layer.copy()  # sorted packed states
+    history = []  # (parent index, action code) arrays for each layer
+    while layer.size:
+        problem.count_expanded(layer.size)
+        moves = targets[layer >> shift]
+        parents, codes = np.nonzero(moves >= 0)
+        cells = moves[parents, codes]
+        children = cells << shift | (layer[parents] & all_medals
+                                     & ~cell_bits[cells])
+        # keep the first way each child was generated
+        children, first = np.unique(children, return_index=True)
+        parents = parents[first]
+        codes = codes[first]
+        if visited.dtype == np.uint8:
+            bits = np.uint8(1) << (children & 7).astype(np.uint8)
+            new = (visited[children >> 3] & bits) == 0
+            children = children[new]
+            # several children may share a byte
+            np.bitwise_or.at(visited, children >> 3, bits[new])
+        else:
+            new = ~np.isin(children, visited, assume_unique=True)
+            children = children[new]
+            visited = np.union1d(visited, children)
+        parents = parents[new]
+        codes = codes[new]
+        history.append((parents, codes))
+        goals = np.flatnonzero((children & all_medals) == 0)
+        if goals.size:  # we found a solution
+            solution = []
+            node = goals[0]
+            for parents, codes in reversed(history):
+                solution.append(actions[codes[node]])
+                node = parents[node]
+            solution.reverse()
+            return solution
+        layer = children
+    return None  # Failure -  no solution was found
+
+
+def ucs(problem, dominance=False):
     """
     Uniform cost first graph search algorithm
     :param
     problem (a Problem object) representing the quest
             see Problem class definition in spartanquest.py)
+    dominance (Boolean): prune the states dominated by a settled state
+            at the same position with a subset of their medals (see
+            data_structures.DominanceIndex) instead of keeping a
+            closed set
+    :return: list of actions representing the solution to the quest
+    """
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
+    closed = set()  # keep track of our explored states
+    settled = data_structures.DominanceIndex(  # used with dominance
+        len(problem.medal_list))
+    # for ucs, the fringe is a priority queue with one entry per state
+    # (a bucket queue when the step costs are ints)
+    fringe = data_structures.frontier(problem.cost.values(), 0)
+    nodes = data_structures.NodeArena(problem.cost)  # node ids are ints
+    state = problem.start_state()
+    root = nodes.add(state, -1, None)
+    fringe.push(state, root, 0)
+    while not fringe.is_empty():
+        node = fringe.pop()
+        state = nodes.states[node]
+        if problem.is_goal(state):
+            return nodes.solution(node)  # we found a solution
+        if dominance:
+            position, medals = state
+            if settled.dominated(position, medals, nodes.costs[node]):
+                continue  # a state settled since it was pushed is better
+            settled.add(position, medals, nodes.costs[node])
+        else:
+            closed.add(state)  # we are implementing graph search
+        for child_state, action, action_cost in problem.expand(state):
+            if child_state in closed:
+                continue
+            cost = nodes.costs[node] + action_cost
+            if dominance and settled.dominated(*child_state, cost):
+                continue
+            if not fringe.contains(child_state):
+                child_node = nodes.add(child_state, node, action, cost)
+                fringe.push(child_state, child_node, cost)
+            elif cost < fringe.priority_of(child_state):
+                # cheaper path to a state already in the fringe
+                child_node = nodes.add(child_state, node, action, cost)
+                fringe.decrease_key(child_state, child_node, cost)
+    return None  # Failure -  no solution was found
+
+
+def external_ucs(problem, memory_limit=64):
+    """
+    Uniform cost graph search algorithm with the fringe and the closed
+    set on disk, for state spaces that do not fit in memory.
+    States are packed into ints as in layered_bfs.  The fringe is a
+    bucket of (state, parent state) records per path cost
+    (data_structures.DiskBuckets) and the closed set is made of sorted
+    run files (data_structures.DiskClosedSet), both spilled to a
+    temporary directory past the memory limit.  Duplicates are
+    detected in batches: each batch of records of the cheapest bucket
+    is deduplicated with NumPy, checked against the closed set, settled
+    and expanded at once.
+    The buckets need integer step costs, falls back to ucs otherwise.
+    :param
+    problem (a Problem object) representing the quest
+            see Problem class definition in spartanquest.py)
+    memory_limit (number): roughly how many megabytes of records the
+            fringe and the closed set keep in memory
     :return: list of actions representing the solution to the quest
+            or None if there is no solution
     """
-    # Enter your code here and remove the pass statement below
-    pass
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
+    if not all(type(value) is int for value in problem.cost.values()):
+        return ucs(problem)
+    maze = problem.maze
+    actions, targets, cell_bits = _move_tables(problem)
+    action_costs = [problem.cost[action] for action in actions]
+    shift = len(problem.medal_list)
+    all_medals = (1 << shift) - 1
+    # a record is two int64: 16 bytes, half the memory for each side
+    capacity = max(1, int(memory_limit * 2 ** 20) // 32)
+
+    position, medals = problem.start_state()
+    root = maze.index(position) << shift | medals
+    with tempfile.TemporaryDirectory() as directory:
+        fringe = data_structures.DiskBuckets(directory, capacity)
+        closed = data_structures.DiskClosedSet(directory, capacity)
+        fringe.push(0, np.array([[root, -1]], np.int64))
+        while not fringe.is_empty():
+            cost = fringe.min_priority()
+            for records in fringe.pop(cost):
+                # delayed duplicate detection, one batch at a time
+                states, first = np.unique(records[:, 0], return_index=True)
+                records = closed.remove_known(records[first])
+                if not len(records):
+                    continue
+                closed.add(records)
+                problem.count_expanded(len(records))
+                goals = np.flatnonzero((records[:, 0] & all_medals) == 0)
+                if goals.size:  # we found a solution
+                    return _external_solution(problem, closed,
+                                              int(records[goals[0], 0]))
+                cells = records[:, 0] >> shift
+                medals = records[:, 0] & all_medals
+                for code, action_cost in enumerate(action_costs):
+                    moved = np.flatnonzero(targets[cells, code] >= 0)
+                    target = targets[cells[moved], code]
+                    children = target << shift | (medals[moved]
+                                                  & ~cell_bits[target])
+                    fringe.push(cost + action_cost,
+                                np.column_stack((children,
+                                                 records[moved, 0])))
+    return None  # Failure -  no solution was found
+
+
+def _external_solution(problem, closed, state):
+    """
+    Follow the parent states of the closed set back to the root
+    This is a private function.
+    :param
+    problem (a Problem object) representing the quest
+    closed (data_structures.DiskClosedSet): the settled states
+    state (int): the packed goal state
+    :return: list of actions from the start state to the given state
+    """
+    maze = problem.maze
+    shift = len(problem.medal_list)
+    solution = []
+    parent = closed.parent(state)
+    while parent >= 0:
+        # the move from the parent cell to the cell of the state
+        solution.append(next(action for target, action, action_cost
+                             in maze.neighbors[parent >> shift]
+                             if target == state >> shift))
+        state = parent
+        parent = closed.parent(state)
+    solution.reverse()
+    return solution
+
+
+def bidirectional_ucs(problem):
+    """
+    Bidirectional uniform cost graph search algorithm for quests with
+    a single medal left.
+    A forward search from Sammy's position over the maze neighbor table
+    and a backward search from the medal's position over the reverse
+    edges (the predecessors table, built from Problem.moves and
+    Problem.cost) take turns expanding the side whose fringe has the
+    lowest cost.  The search stops when the two lowest fringe costs add
+    up to at least the cheapest path found through a cell reached from
+    both sides, which is then optimal even though moves have
+    directional costs.
+    Falls back to ucs when more than one medal remains.
+    :param
+    problem (a Problem object) representing the quest
+            see Problem class definition in spartanquest.py)
+    :return: list of actions representing the solution to the quest
+            or None if there is no solution
+    """
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
+    state = problem.start_state()
+    if problem.is_goal(state):
+        return []
+    position, medals = state
+    if medals & (medals - 1) or position in problem.medal_bits:
+        # several medals, or Sammy must leave the medal and come back
+        return ucs(problem)
+    maze = problem.maze
+    start = maze.index(position)
+    goal = maze.index(problem.medal_list[medals.bit_length() - 1])
+    # one entry per direction: fringe, cost to each cell, parent links,
+    # edge table
+    sides = []
+    for source, edges in ((start, maze.neighbors),
+                          (goal, maze.predecessors)):
+        fringe = data_structures.frontier(problem.cost.values(), 0)
+        fringe.push(source, source, 0)
+        sides.append((fringe, {source: 0}, {source: None}, edges))
+    (forward, forward_cost, forward_parent, _), \
+        (backward, backward_cost, backward_parent, _) = sides
+    best = math.inf  # cheapest path found through a meeting cell
+    meeting = None
+    closed = [set(), set()]
+    while not forward.is_empty() and not backward.is_empty():
+        if forward.min_priority() + backward.min_priority() >= best:
+            break  # no cheaper path can be found
+        side = 0 if forward.min_priority() <= backward.min_priority() else 1
+        fringe, cost, parent, edges = sides[side]
+        other_cost = sides[1 - side][1]
+        cell = fringe.pop()
+        closed[side].add(cell)
+        problem.count_expanded(1)
+        for other, action, action_cost in edges[cell]:
+            if other in closed[side]:
+                continue
+            new_cost = cost[cell] + action_cost
+            if new_cost < cost.get(other, math.inf):
+                cost[other] = new_cost
+                parent[other] = (cell, action)
+                if fringe.contains(other):
+                    fringe.decrease_key(other, other, new_cost)
+                else:
+                    fringe.push(other, other, new_cost)
+            if other in other_cost and \
+                    cost[other] + other_cost[other] < best:
+                best = cost[other] + other_cost[other]
+                meeting = other
+    if meeting is None:
+        return None  # Failure -  no solution was found
+    solution = []
+    cell = meeting
+    while forward_parent[cell] is not None:
+        cell, action = forward_parent[cell]
+        solution.append(action)
+    solution.reverse()
+    cell = meeting
+    while backward_parent[cell] is not None:
+        cell, action = backward_parent[cell]
+        solution.append(action)
+    return solution
+
+
+def held_karp(problem):
+    """
+    Exact medal ordering solver for multi-medal quests
+    The cost of the cheapest path between Sammy's position and each
+    medal and between every two medals comes from one Dijkstra search
+    per medal (Problem.medal_distances).  The Held-Karp dynamic program
+    then finds the cheapest order to collect the medals:
+    best[mask, j] is the cost of the cheapest path from Sammy's position
+    that collects the medals in mask, medal j last.  It is filled one
+    medal count at a time with NumPy, so it uses 2^k * k numbers for k
+    medals and suits up to about 20 medals.
+    Collecting a medal on the way to another one never costs more, so
+    the legs of the best order stitched together are an optimal solution.
+    :param
+    problem (a Problem object) representing the quest
+            see Problem class definition in spartanquest.py)
+    :return: list of actions representing the solution to the quest
+            or None if there is no solution
+    """
+    if problem.unreachable_medals:
+        return None  # Failure -  a medal cannot be reached
+    state = problem.start_state()
+    if problem.is_goal(state):
+        return []
+    position, medals = state
+    maze = problem.maze
+    start = maze.index(position)
+    # the medals left and the cells they are in
+    medal_indices = [i for i in range(len(problem.medal_list))
+                     if medals >> i & 1]
+    cells = [maze.index(problem.medal_list[i]) for i in medal_indices]
+    to_medal = [problem.medal_distances()[i] for i in medal_indices]
+    count = len(cells)
+    # legs[i, j] is the cost from medal i to medal j
+    legs = np.array([[to_medal[j][cells[i]] for j in range(count)]
+                     for i in range(count)], np.float64)
+    best = np.full((1 << count, count), math.inf)
+    for j in range(count):
+        best[1 << j, j] = to_medal[j][start]
+    masks = np.arange(1 << count)
+    sizes = np.zeros(1 << count, np.int64)  # the medals in each mask
+    for j in range(count):
+        sizes += masks >> j & 1
+    for size in range(1, count):
+        layer = masks[sizes == size]
+        problem.count_expanded(layer.size * size)
+        for j in range(count):
+            # cheapest way to reach medal j from each mask without it,
+            # one medal at a time to keep the arrays the size of a layer
+            outside = layer[(layer >> j & 1) == 0]
+            best[outside | 1 << j, j] = \
+                (best[outside] + legs[:, j]).min(axis=1)
+    # walk the best order backwards from the last medal collected
+    mask = (1 << count) - 1
+    last = int(np.argmin(best[mask]))
+    if best[mask, last] == math.inf:
+        return None  # Failure -  no solution was found
+    order = [last]
+    while mask != 1 << last:
+        previous = mask & ~(1 << last)
+        costs = best[previous] + legs[:, last]
+        last = int(np.argmin(costs))
+        mask = previous
+        order.append(last)
+    order.reverse()
+    # stitch the legs: follow the cheapest move toward each medal
+    solution = []
+    cell = start
+    for j in order:
+        distances = to_medal[j]
+        while cell != cells[j]:
+            target, action, action_cost = min(
+                maze.neighbors[cell],
+                key=lambda move: move[2] + distances[move[0]])
+            solution.append(action)
+            cell = target
+    return solution